@@ -0,0 +1,163 @@
+"""In-memory index of active NWS alerts, fed by polling the national alerts feed."""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def alert_states(feature: dict) -> set[str]:
+    """Return the state codes an alert covers, from the UGC zone codes it lists (e.g. CAZ072)."""
+    geocode = feature["properties"].get("geocode") or {}
+    return {code[:2] for code in geocode.get("UGC", [])}
+
+
+def alert_zones(feature: dict) -> set[str]:
+    """Return the zone codes an alert covers, from its UGC codes and affectedZones URLs."""
+    props = feature["properties"]
+    zones = set((props.get("geocode") or {}).get("UGC", []))
+    zones.update(url.rstrip("/").rsplit("/", 1)[-1] for url in props.get("affectedZones", []))
+    return zones
+
+
+def alert_id(feature: dict) -> str:
+    return feature.get("id") or feature["properties"]["id"]
+
+
+@dataclass
+class AlertDiff:
+    """What changed between two snapshots of the active alerts feed."""
+
+    added: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+
+class AlertIndex:
+    """The current set of active alerts, indexed by state, zone and severity.
+
+    Feed order is preserved, so lookups return alerts in the order NWS lists them.
+    """
+
+    def __init__(self) -> None:
+        self._alerts: dict[str, dict] = {}
+        self._by_state: defaultdict[str, set[str]] = defaultdict(set)
+        self._by_zone: defaultdict[str, set[str]] = defaultdict(set)
+        self._by_severity: defaultdict[str, set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def replace(self, features: list[dict]) -> AlertDiff:
+        """Make `features` the current snapshot and return how it differs from the previous one."""
+        diff = AlertDiff()
+        snapshot = {alert_id(feature): feature for feature in features}
+        for key in self._alerts.keys() - snapshot.keys():
+            self._unindex(key, self._alerts[key])
+            diff.removed.append(key)
+        for key, feature in snapshot.items():
+            previous = self._alerts.get(key)
+            if previous is None:
+                diff.added.append(key)
+            elif previous != feature:
+                self._unindex(key, previous)
+                diff.updated.append(key)
+            else:
+                continue
+            self._index(key, feature)
+        self._alerts = snapshot
+        return diff
+
+    def _index(self, key: str, feature: dict) -> None:
+        for state in alert_states(feature):
+            self._by_state[state].add(key)
+        for zone in alert_zones(feature):
+            self._by_zone[zone].add(key)
+        self._by_severity[feature["properties"].get("severity", "Unknown")].add(key)
+
+    def _unindex(self, key: str, feature: dict) -> None:
+        for index, values in (
+            (self._by_state, alert_states(feature)),
+            (self._by_zone, alert_zones(feature)),
+            (self._by_severity, {feature["properties"].get("severity", "Unknown")}),
+        ):
+            for value in values:
+                index[value].discard(key)
+                if not index[value]:
+                    del index[value]
+
+    def _select(self, keys: set[str]) -> list[dict]:
+        return [feature for key, feature in self._alerts.items() if key in keys]
+
+    def by_states(self, states: list[str]) -> list[dict]:
+        keys = set().union(*(self._by_state.get(state, ()) for state in states))
+        return self._select(keys)
+
+    def by_zone(self, zone: str) -> list[dict]:
+        return self._select(self._by_zone.get(zone, set()))
+
+    def by_severity(self, severity: str) -> list[dict]:
+        return self._select(self._by_severity.get(severity, set()))
+
+
+class AlertIngester:
+    """Polls the national active-alerts feed on a schedule and keeps an AlertIndex current.
+
+    Upstream traffic is one request per interval, however many sessions query the index.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[dict[str, Any] | None]], interval: float) -> None:
+        self.index = AlertIndex()
+        self.interval = interval
+        self._fetch = fetch
+        self._task: asyncio.Task | None = None
+        self.last_success: float | None = None
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the index reflects a poll recent enough to answer queries from."""
+        return self.last_success is not None and time.monotonic() - self.last_success < 3 * self.interval
+
+    async def poll(self) -> AlertDiff | None:
+        data = await self._fetch()
+        if not data or "features" not in data:
+            logger.warning("Active alerts poll failed; keeping the previous snapshot")
+            return None
+        diff = self.index.replace(data["features"])
+        self.last_success = time.monotonic()
+        if diff:
+            logger.info(
+                "Active alerts: %d added, %d updated, %d removed (%d total)",
+                len(diff.added), len(diff.updated), len(diff.removed), len(self.index),
+            )
+        return diff
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Active alerts poll failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
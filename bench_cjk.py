@@ -0,0 +1,70 @@
+"""Benchmark the in-process CJK counter against the remote Azure Function it replaced.
+
+    uv run bench_cjk.py            # local counter only
+    uv run bench_cjk.py --remote   # also time the remote HTTP endpoint
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from cjk import count_cjk_characters
+
+REMOTE_COUNT_API = "https://haxufunctions.azurewebsites.net/api/http_trigger"
+
+SAMPLES = {
+    "ascii": "The quick brown fox jumps over the lazy dog. ",
+    "chinese": "床前明月光，疑是地上霜。举头望明月，低头思故乡。",
+    "mixed": "Azure 价格查询 returns 中文 results, 𠀀𪜀 included. ",
+}
+
+
+def make_text(sample: str, size: int) -> str:
+    return (sample * (size // len(sample) + 1))[:size]
+
+
+def time_local(text: str, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count_cjk_characters(text)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def time_remote(text: str, repeat: int) -> list[float]:
+    timings = []
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = await client.get(REMOTE_COUNT_API, params={"text": text})
+            response.raise_for_status()
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    print(f"  {label:<7} median {statistics.median(timings) * 1000:9.3f} ms   min {min(timings) * 1000:9.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Chinese character counting")
+    parser.add_argument("--remote", action="store_true", help="Also time the remote Azure Function")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per input")
+    args = parser.parse_args()
+
+    for name, sample in SAMPLES.items():
+        for size in (100, 10_000, 1_000_000):
+            text = make_text(sample, size)
+            print(f"{name} x {size} chars: {count_cjk_characters(text)} CJK characters")
+            report("local", time_local(text, args.repeat))
+            # The remote endpoint takes the text as a query parameter, so large inputs exceed URL limits
+            if args.remote and size <= 2_000:
+                report("remote", asyncio.run(time_remote(text, min(args.repeat, 5))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""In-process counting of Chinese (CJK Unified Ideograph) characters."""
+
+import re
+
+# CJK Unified Ideographs and all of its extension blocks, as of Unicode 15.1
+CJK_UNIFIED_IDEOGRAPH_RANGES = (
+    (0x3400, 0x4DBF),  # Extension A
+    (0x4E00, 0x9FFF),  # CJK Unified Ideographs
+    (0x20000, 0x2A6DF),  # Extension B
+    (0x2A700, 0x2B73F),  # Extension C
+    (0x2B740, 0x2B81F),  # Extension D
+    (0x2B820, 0x2CEAF),  # Extension E
+    (0x2CEB0, 0x2EBEF),  # Extension F
+    (0x2EBF0, 0x2EE5F),  # Extension I
+    (0x30000, 0x3134F),  # Extension G
+    (0x31350, 0x323AF),  # Extension H
+)
+
+# Matching whole runs keeps the per-character work inside the regex engine,
+# which is several times faster than one match per ideograph on Chinese text.
+_CJK_RUN = re.compile(
+    "[" + "".join(f"{chr(first)}-{chr(last)}" for first, last in CJK_UNIFIED_IDEOGRAPH_RANGES) + "]+"
+)
+
+
+def count_cjk_characters(text: str) -> int:
+    """Count the CJK Unified Ideographs in `text`."""
+    if text.isascii():
+        return 0
+    return sum(map(len, _CJK_RUN.findall(text)))
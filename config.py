@@ -0,0 +1,24 @@
+"""Reading settings from environment variables.
+
+Kept free of other imports so any module, logging setup included, can use it
+without pulling in the HTTP, cache or metrics machinery.
+"""
+
+import os
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,117 @@
+"""Persistent response cache shared by every worker process on a host.
+
+Entries live in a SQLite database in WAL mode, so several uvicorn workers
+can read and write it concurrently, and a freshly started worker can answer
+from responses cached before it started. Times are stored as wall-clock
+timestamps because monotonic clocks are not comparable across processes.
+"""
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class DiskEntry(NamedTuple):
+    body: Any
+    fresh_until: float
+    stale_until: float
+    etag: str | None
+    last_modified: str | None
+
+
+class DiskCache:
+    """SQLite-backed store of upstream responses, partitioned by namespace.
+
+    All database work runs on one background thread per process: reads are
+    awaited, writes are fire-and-forget so they never hold up a tool call.
+    Every `prune_every` writes, rows that can no longer be served or
+    revalidated are removed and the table is trimmed to `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10_000, prune_every: int = 100) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                body TEXT NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_stored_at ON responses (stored_at)")
+
+    def _get(self, namespace: str, key: str) -> DiskEntry | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, fresh_until, stale_until, etag, last_modified FROM responses"
+                " WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None:
+            return None
+        return DiskEntry(json.loads(row[0]), row[1], row[2], row[3], row[4])
+
+    def _put(self, namespace: str, key: str, entry: DiskEntry) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(entry.body), entry.fresh_until, entry.stale_until,
+                 entry.etag, entry.last_modified, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._db.execute(
+            "DELETE FROM responses WHERE stale_until < ? AND etag IS NULL AND last_modified IS NULL",
+            (time.time(),),
+        )
+        self._db.execute(
+            "DELETE FROM responses WHERE rowid IN"
+            " (SELECT rowid FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    async def get(self, namespace: str, key: str) -> DiskEntry | None:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._get, namespace, key)
+        except sqlite3.Error:
+            logger.exception("Reading %s from the disk cache failed", key)
+            return None
+
+    def put(self, namespace: str, key: str, entry: DiskEntry) -> None:
+        self._executor.submit(self._put, namespace, key, entry).add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(future: Future) -> None:
+        if future.exception() is not None:
+            logger.error("Writing to the disk cache failed", exc_info=future.exception())
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
@@ -1,15 +1,64 @@
-from typing import Any
+import asyncio
+import base64
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import dataclass
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
 import httpx
 from mcp.server.fastmcp import FastMCP
 from starlette.applications import Starlette
-from mcp.server.sse import SseServerTransport
 from starlette.requests import Request
+from starlette.responses import Response
 from starlette.routing import Mount, Route
 from mcp.server import Server
+from mcp import types
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
 import uvicorn
 from urllib.parse import quote
 import logging
 
+from alert_index import AlertIngester, alert_id, alert_states
+from cjk import count_cjk_characters
+from config import env_bool, env_float, env_int
+from disk_cache import DiskCache
+from logging_setup import configure_logging
+import metrics
+import tracing
+from odata_filter import FilterNode, FilterSyntaxError, UnsupportedFilterError, parse_filter
+from price_mirror import PriceMirror, keep_refreshed, load_fixture
+from sessions import (
+    RoutedSseTransport,
+    SessionBroker,
+    SessionLimitError,
+    TrackedSseTransport,
+    broker_from_env,
+)
+from sse_writer import CoalescingSend, SlowClientError
+from upstream import (
+    CACHE_REQUESTS,
+    FRESH,
+    STALE,
+    CircuitOpenError,
+    ResponseCache,
+    SingleFlight,
+    TTLCache,
+    UpstreamConfig,
+    UpstreamPool,
+    UpstreamThrottledError,
+    canonical_url,
+    upstream_unavailable,
+)
+
+logger = logging.getLogger(__name__)
+
 # Initialize FastMCP server for Weather tools (SSE)
 mcp = FastMCP("weather")
 
@@ -18,19 +67,135 @@ NWS_API_BASE = "https://api.weather.gov"
 USER_AGENT = "weather-app/1.0"
 AZURE_PRICE_API_BASE = "https://prices.azure.com/api/retail/prices"
 
+# One pooled client per upstream, shared by every tool call and session
+upstreams = UpstreamPool([
+    UpstreamConfig.from_env("nws", timeout=30.0),
+    UpstreamConfig.from_env("azure_price", timeout=10.0),
+    # Mirror downloads get their own pool, breaker and rate limit so they never crowd out tool calls
+    UpstreamConfig.from_env("azure_price_catalog", timeout=30.0),
+])
+
+# /points lookups map a coordinate to a forecast office grid, which almost never changes
+points_cache = TTLCache(
+    maxsize=env_int("NWS_POINTS_CACHE_SIZE", 4096),
+    ttl=env_float("NWS_POINTS_CACHE_TTL", 24 * 60 * 60),
+)
+
+
+def normalize_point(latitude: float, longitude: float) -> tuple[float, float]:
+    """Round a coordinate to the 4 decimal places NWS resolves /points at."""
+    return round(latitude, 4), round(longitude, 4)
+
+
+# NWS responses carry Cache-Control/Expires; many sessions ask about the same places
+# Optional on-disk cache shared by every worker on the host
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH")
+response_disk_cache = (
+    DiskCache(RESPONSE_CACHE_PATH, max_entries=env_int("RESPONSE_CACHE_MAX_ENTRIES", 10_000))
+    if RESPONSE_CACHE_PATH
+    else None
+)
+
+nws_cache = ResponseCache(
+    maxsize=env_int("NWS_CACHE_SIZE", 1024),
+    default_swr=env_float("NWS_CACHE_STALE_WHILE_REVALIDATE", 60.0),
+    name="nws",
+    backend=response_disk_cache,
+)
+
+# Retail prices change rarely; pages are cached for AZURE_PRICE_CACHE_TTL unless the API says otherwise
+azure_price_cache = ResponseCache(
+    maxsize=env_int("AZURE_PRICE_CACHE_SIZE", 256),
+    default_ttl=env_float("AZURE_PRICE_CACHE_TTL", 60 * 60),
+    name="azure_price",
+    backend=response_disk_cache,
+)
+
+# Concurrent requests for the same URL share one upstream call
+inflight = SingleFlight()
+
+# Page limits for get_azure_price. With a fan-out above 1, pages are fetched
+# concurrently by $skip offset instead of walking NextPageLink one at a time.
+AZURE_PRICE_MAX_PAGES = env_int("AZURE_PRICE_MAX_PAGES", 3)
+AZURE_PRICE_PAGE_FANOUT = env_int("AZURE_PRICE_PAGE_FANOUT", 0)
+AZURE_PRICE_API_VERSION = "2023-01-01-preview"
+
+# Per-call budget for get_azure_price; anything beyond it is left behind a continuation cursor
+AZURE_PRICE_MAX_CHARS = env_int("AZURE_PRICE_MAX_CHARS", 100_000)
+AZURE_PRICE_TIME_BUDGET = env_float("AZURE_PRICE_TIME_BUDGET", 20.0)
+# Cursors carry their own resume state, so any replica can continue them; with a secret they are signed
+AZURE_PRICE_CURSOR_TTL = env_float("AZURE_PRICE_CURSOR_TTL", 15 * 60)
+AZURE_PRICE_CURSOR_SECRET = os.environ.get("AZURE_PRICE_CURSOR_SECRET", "")
+
+# Optional local copy of the price catalog, kept up to date in the background.
+# AZURE_PRICE_MIRROR_SOURCE loads it from a saved JSON catalog instead of the API.
+AZURE_PRICE_MIRROR_PATH = os.environ.get("AZURE_PRICE_MIRROR_PATH")
+AZURE_PRICE_MIRROR_SOURCE = os.environ.get("AZURE_PRICE_MIRROR_SOURCE")
+AZURE_PRICE_MIRROR_REFRESH = env_float("AZURE_PRICE_MIRROR_REFRESH", 24 * 60 * 60)
+AZURE_PRICE_MIRROR_MAX_ITEMS = env_int("AZURE_PRICE_MIRROR_MAX_ITEMS", 1000)
+price_mirror = PriceMirror(AZURE_PRICE_MIRROR_PATH) if AZURE_PRICE_MIRROR_PATH else None
+
+CJK_COUNT_CHUNK = 256 * 1024
+
+# Optional background poller of the national alerts feed; get_alerts then
+# answers from its in-memory index instead of calling NWS per request.
+NWS_ALERT_POLL_INTERVAL = env_float("NWS_ALERT_POLL_INTERVAL", 0)
+alert_ingester = (
+    AlertIngester(lambda: make_nws_request(f"{NWS_API_BASE}/alerts/active"), NWS_ALERT_POLL_INTERVAL)
+    if NWS_ALERT_POLL_INTERVAL > 0
+    else None
+)
+
+# get_forecast_many limits
+FORECAST_BATCH_MAX_LOCATIONS = env_int("FORECAST_BATCH_MAX_LOCATIONS", 50)
+FORECAST_BATCH_CONCURRENCY = env_int("FORECAST_BATCH_CONCURRENCY", 8)
+
+
 async def make_nws_request(url: str) -> dict[str, Any] | None:
     """Make a request to the NWS API with proper error handling."""
+    with tracing.span("nws.request", **{"url.full": url}) as current:
+        entry, status = await nws_cache.load(url)
+        tracing.set_attributes(current, **{"cache.status": status or "miss"})
+        if status == FRESH:
+            return entry.body
+
+        def fetch():
+            return inflight.do(canonical_url(url), lambda: fetch_nws(url))
+
+        if status == STALE:
+            # Serve the stale copy now and refresh it in the background
+            nws_cache.revalidate(url, fetch)
+            return entry.body
+        return await fetch()
+
+
+async def fetch_nws(url: str) -> dict[str, Any] | None:
+    """Fetch a URL from the NWS API and store the response in the cache.
+
+    If a previous response is cached, it is revalidated with its ETag /
+    Last-Modified and reused on 304 Not Modified.
+    """
     headers = {
         "User-Agent": USER_AGENT,
         "Accept": "application/geo+json"
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            return None
+    cached = nws_cache.peek(url)
+    if cached is not None:
+        headers.update(cached.conditional_headers())
+    try:
+        response = await upstreams.get("nws", url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            entry = nws_cache.refresh(url, response.headers)
+            return (entry or cached).body
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        # While NWS is down, an outdated answer beats none
+        if cached is not None and upstream_unavailable(e):
+            return cached.body
+        return None
+    nws_cache.store(url, data, response.headers)
+    return data
 
 
 def format_alert(feature: dict) -> str:
@@ -46,14 +211,25 @@ Instructions: {props.get('instruction', 'No specific instructions provided')}
 
 
 @mcp.tool()
-async def get_alerts(state: str) -> str:
-    """Get weather alerts for a US state.
+async def get_alerts(state: str | list[str]) -> str:
+    """Get weather alerts for a US state, or for several states at once.
 
     Args:
-        state: Two-letter US state code (e.g. CA, NY)
+        state: Two-letter US state code (e.g. CA, NY), or a list of codes (e.g. ["CA", "NV", "OR"])
     """
-    url = f"{NWS_API_BASE}/alerts/active/area/{state}"
-    data = await make_nws_request(url)
+    states = [state] if isinstance(state, str) else state
+    states = list(dict.fromkeys(code.strip().upper() for code in states if code.strip()))
+    if len(states) > 1:
+        return await get_alerts_for_states(states)
+    if not states:
+        return "No state given."
+    state = states[0]
+
+    if alert_ingester is not None and alert_ingester.fresh:
+        data = {"features": alert_ingester.index.by_states([state])}
+    else:
+        url = f"{NWS_API_BASE}/alerts/active/area/{state}"
+        data = await make_nws_request(url)
 
     if not data or "features" not in data:
         return "Unable to fetch alerts or no alerts found."
@@ -65,6 +241,69 @@ async def get_alerts(state: str) -> str:
     return "\n---\n".join(alerts)
 
 
+async def get_alerts_for_states(states: list[str]) -> str:
+    """Fetch alerts for several states with one request and group them by state.
+
+    An alert covering more than one of the requested states is listed once,
+    under a combined heading.
+    """
+    if alert_ingester is not None and alert_ingester.fresh:
+        data = {"features": alert_ingester.index.by_states(states)}
+    else:
+        url = f"{NWS_API_BASE}/alerts/active?area={','.join(states)}"
+        data = await make_nws_request(url)
+
+    if not data or "features" not in data:
+        return "Unable to fetch alerts or no alerts found."
+
+    groups: dict[tuple[str, ...], list[str]] = {(code,): [] for code in states}
+    seen = set()
+    for feature in data["features"]:
+        feature_id = alert_id(feature)
+        if feature_id in seen:
+            continue
+        seen.add(feature_id)
+        covered = alert_states(feature)
+        key = tuple(code for code in states if code in covered) or ("Other",)
+        groups.setdefault(key, []).append(format_alert(feature))
+
+    with_alerts = {code for key, alerts in groups.items() if alerts for code in key}
+    sections = []
+    for key, alerts in groups.items():
+        if key == ("Other",):
+            heading = "Other alerts"
+        elif len(key) == 1:
+            heading = f"Alerts for {key[0]}"
+        else:
+            heading = f"Alerts covering {', '.join(key)}"
+        if alerts:
+            sections.append(f"== {heading} ==\n" + "\n---\n".join(alerts))
+        elif key[0] not in with_alerts:
+            sections.append(f"== {heading} ==\nNo active alerts for this state.\n")
+    return "\n".join(sections)
+
+
+async def get_forecast_url(latitude: float, longitude: float) -> str | None:
+    """Resolve the forecast URL for a location, using the /points cache when possible."""
+    point = normalize_point(latitude, longitude)
+    forecast_url = points_cache.get(point)
+    CACHE_REQUESTS.inc("nws_points", "fresh" if forecast_url else "miss")
+    if forecast_url:
+        return forecast_url
+
+    # First get the forecast grid endpoint
+    points_url = f"{NWS_API_BASE}/points/{point[0]},{point[1]}"
+    points_data = await make_nws_request(points_url)
+
+    if not points_data:
+        return None
+
+    # Get the forecast URL from the points response
+    forecast_url = points_data["properties"]["forecast"]
+    points_cache.set(point, forecast_url)
+    return forecast_url
+
+
 @mcp.tool()
 async def get_forecast(latitude: float, longitude: float) -> str:
     """Get weather forecast for a location.
@@ -73,21 +312,65 @@ async def get_forecast(latitude: float, longitude: float) -> str:
         latitude: Latitude of the location
         longitude: Longitude of the location
     """
-    # First get the forecast grid endpoint
-    points_url = f"{NWS_API_BASE}/points/{latitude},{longitude}"
-    points_data = await make_nws_request(points_url)
+    forecast_url = await get_forecast_url(latitude, longitude)
 
-    if not points_data:
+    if not forecast_url:
         return "Unable to fetch forecast data for this location."
 
-    # Get the forecast URL from the points response
-    forecast_url = points_data["properties"]["forecast"]
     forecast_data = await make_nws_request(forecast_url)
 
     if not forecast_data:
         return "Unable to fetch detailed forecast."
 
-    # Format the periods into a readable forecast
+    with tracing.span("format_forecast"):
+        return format_forecast(forecast_data)
+
+
+@mcp.tool()
+async def get_forecast_many(locations: list[list[float]]) -> str:
+    """Get weather forecasts for several locations at once.
+
+    Args:
+        locations: List of [latitude, longitude] pairs, e.g. [[47.6587, -117.426], [40.7128, -74.006]]
+    """
+    if not locations:
+        return "No locations given."
+    if len(locations) > FORECAST_BATCH_MAX_LOCATIONS:
+        return f"Too many locations; at most {FORECAST_BATCH_MAX_LOCATIONS} are allowed per call."
+    if any(len(location) != 2 for location in locations):
+        return "Each location must be a [latitude, longitude] pair."
+
+    semaphore = asyncio.Semaphore(FORECAST_BATCH_CONCURRENCY)
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    # Resolve each distinct point to its grid, then fetch each distinct grid once
+    points = list(dict.fromkeys(normalize_point(lat, lon) for lat, lon in locations))
+    urls = await asyncio.gather(*(bounded(get_forecast_url(lat, lon)) for lat, lon in points))
+    forecast_urls = dict(zip(points, urls))
+
+    grids = [url for url in dict.fromkeys(urls) if url]
+    grid_data = await asyncio.gather(*(bounded(make_nws_request(url)) for url in grids))
+    forecasts = dict(zip(grids, grid_data))
+
+    results = []
+    for lat, lon in locations:
+        forecast_url = forecast_urls[normalize_point(lat, lon)]
+        if not forecast_url:
+            body = "Unable to fetch forecast data for this location."
+        elif not forecasts[forecast_url]:
+            body = "Unable to fetch detailed forecast."
+        else:
+            body = format_forecast(forecasts[forecast_url])
+        results.append(f"Forecast for {lat}, {lon}:\n{body}")
+
+    return "\n===\n".join(results)
+
+
+def format_forecast(forecast_data: dict[str, Any]) -> str:
+    """Format the next forecast periods into a readable string."""
     periods = forecast_data["properties"]["periods"]
     forecasts = []
     for period in periods[:5]:  # Only show next 5 periods
@@ -101,6 +384,125 @@ Forecast: {period['detailedForecast']}
 
     return "\n---\n".join(forecasts)
 
+
+def format_price_item(item: dict[str, Any]) -> str:
+    """Format one Azure price item into a readable string."""
+    price_info = []
+    # Extract key information
+    if "productName" in item:
+        price_info.append(f"Product: {item['productName']}")
+    if "skuName" in item:
+        price_info.append(f"SKU: {item['skuName']}")
+    if "retailPrice" in item:
+        price_info.append(f"Price: {item['retailPrice']} USD")
+    if "unitOfMeasure" in item:
+        price_info.append(f"Per: {item['unitOfMeasure']}")
+    if "armRegionName" in item:
+        price_info.append(f"Region: {item['armRegionName']}")
+    return "\n".join(price_info)
+
+
+class PriceListing:
+    """Formats price items into one growing text buffer as they arrive.
+
+    Each page can be dropped as soon as it has been added, so memory use does
+    not depend on how many pages a query spans beyond the text itself.
+    """
+
+    separator = "\n\n---\n\n"
+
+    def __init__(self) -> None:
+        self._buffer = io.StringIO()
+        self.count = 0
+
+    def add(self, items: Iterable[dict[str, Any]]) -> None:
+        for item in items:
+            if self.count:
+                self._buffer.write(self.separator)
+            self._buffer.write(format_price_item(item))
+            self.count += 1
+
+    @property
+    def size(self) -> int:
+        return self._buffer.tell()
+
+    def render(self, summary: str) -> str:
+        return f"{summary}\n\n{self._buffer.getvalue()}"
+
+
+@dataclass(frozen=True)
+class PriceContinuation:
+    """Where a price query resumes: an API page URL, or an offset into the local mirror."""
+
+    next_page_url: str | None = None
+    where: FilterNode | None = None
+    offset: int = 0
+    # Source text of `where`, which is what a cursor stores
+    filter_expression: str | None = None
+
+
+def price_query_url(filter_expression: str, skip: int = 0) -> str:
+    """URL of the first price API page for a filter, optionally starting `skip` items in."""
+    url = f"{AZURE_PRICE_API_BASE}?api-version={AZURE_PRICE_API_VERSION}&$filter={quote(filter_expression)}"
+    return f"{url}&$skip={skip}" if skip else url
+
+
+def is_price_api_url(url: str) -> bool:
+    """Whether `url` points into the price API (NextPageLinks may spell out port 443)."""
+    try:
+        parsed, base = httpx.URL(url), httpx.URL(AZURE_PRICE_API_BASE)
+    except httpx.InvalidURL:
+        return False
+    return (parsed.scheme, parsed.host, parsed.port or 443, parsed.path) == (base.scheme, base.host, 443, base.path)
+
+
+def _cursor_signature(payload: str) -> str:
+    digest = hmac.new(AZURE_PRICE_CURSOR_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode()
+
+
+def encode_cursor(continuation: PriceContinuation) -> str:
+    """Pack a continuation into an opaque cursor (base64url JSON, plus an HMAC if a secret is set)."""
+    state: dict[str, Any] = {"t": int(time.time())}
+    if continuation.next_page_url is not None:
+        state["u"] = continuation.next_page_url
+    else:
+        state["f"] = continuation.filter_expression
+        state["o"] = continuation.offset
+    payload = base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).rstrip(b"=").decode()
+    if AZURE_PRICE_CURSOR_SECRET:
+        payload = f"{payload}.{_cursor_signature(payload)}"
+    return payload
+
+
+def decode_cursor(cursor: str) -> PriceContinuation | None:
+    """Unpack a cursor from `encode_cursor`; None if it is malformed, forged or expired."""
+    payload, _, signature = cursor.strip().partition(".")
+    if AZURE_PRICE_CURSOR_SECRET and not hmac.compare_digest(signature, _cursor_signature(payload)):
+        return None
+    try:
+        state = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(state, dict) or not isinstance(state.get("t"), int):
+        return None
+    if time.time() - state["t"] > AZURE_PRICE_CURSOR_TTL:
+        return None
+    if "u" in state:
+        url = state["u"]
+        if not isinstance(url, str) or not is_price_api_url(url):
+            return None
+        return PriceContinuation(next_page_url=url)
+    filter_expression, offset = state.get("f"), state.get("o")
+    if not isinstance(filter_expression, str) or not isinstance(offset, int) or offset < 0:
+        return None
+    try:
+        where = parse_filter(filter_expression)
+    except FilterSyntaxError:
+        return None
+    return PriceContinuation(where=where, offset=offset, filter_expression=filter_expression)
+
+
 # fetch Azure Price API by using odata query
 @mcp.tool()
 async def get_azure_price(filter_expression: str) -> str:
@@ -109,104 +511,458 @@ async def get_azure_price(filter_expression: str) -> str:
     Args:
         filter_expression: OData filter expression. Example: contains(armSkuName, 'Standard_D2_v3') and contains(armRegionName, 'eastus')
     """
-    # URL encode the filter expression
-    encoded_filter = quote(filter_expression)
-    api_version = "2023-01-01-preview"
-    base_url = f"{AZURE_PRICE_API_BASE}?api-version={api_version}&$filter={encoded_filter}"
-    
-    all_items = []
-    next_page_url = base_url
-    page_count = 0
-    max_pages = 3  # Limit to 3 pages to avoid timeouts
-    
-    while next_page_url and page_count < max_pages:
-        page_count += 1
-        data = await make_azure_price_request(next_page_url)
-        
-        if not data:
-            break
-        
-        # Add items from this page
-        if "Items" in data:
-            all_items.extend(data["Items"])
-        
-        # Get next page URL if available
-        next_page_url = data.get("NextPageLink", "")
-    
-    if not all_items:
+    # Reject malformed filters before making any request
+    try:
+        parsed_filter = parse_filter(filter_expression)
+    except UnsupportedFilterError:
+        # Valid OData beyond the local grammar: the API can evaluate it, the mirror cannot
+        parsed_filter = None
+    except FilterSyntaxError as e:
+        return f"Invalid filter expression: {e}"
+
+    if parsed_filter is not None and price_mirror is not None and price_mirror.ready:
+        start = PriceContinuation(where=parsed_filter, filter_expression=filter_expression)
+    else:
+        start = PriceContinuation(next_page_url=price_query_url(filter_expression))
+
+    return await fetch_price_chunk(start)
+
+
+@mcp.tool()
+async def get_azure_price_next(cursor: str) -> str:
+    """Get the next chunk of results of an earlier get_azure_price call.
+
+    Args:
+        cursor: Continuation cursor from a get_azure_price or get_azure_price_next result
+    """
+    continuation = decode_cursor(cursor)
+    if continuation is None:
+        return "Unknown or expired cursor. Run get_azure_price again."
+    if continuation.next_page_url is None and (price_mirror is None or not price_mirror.ready):
+        # Issued by a replica with a loaded mirror: continue from the same offset through the API
+        continuation = PriceContinuation(
+            next_page_url=price_query_url(continuation.filter_expression, continuation.offset)
+        )
+    return await fetch_price_chunk(continuation)
+
+
+async def fetch_price_chunk(start: PriceContinuation) -> str:
+    """Collect price items from `start` until the per-call budget runs out.
+
+    If results remain, the summary carries an opaque cursor for
+    get_azure_price_next, which resumes from the NextPageLink (or mirror
+    offset) encoded in it without re-running the query.
+    """
+    listing = PriceListing()
+    if start.next_page_url is None:
+        rest = await collect_mirror_items(start, listing)
+    else:
+        rest = await collect_api_pages(start.next_page_url, listing)
+
+    if not listing.count:
         return "Unable to fetch Azure price data for this filter expression or no results found."
-    
-    # Format the price data into a readable string
-    prices = []
-    for item in all_items:
-        price_info = []
-        # Extract key information
-        if "productName" in item:
-            price_info.append(f"Product: {item['productName']}")
-        if "skuName" in item:
-            price_info.append(f"SKU: {item['skuName']}")
-        if "retailPrice" in item:
-            price_info.append(f"Price: {item['retailPrice']} USD")
-        if "unitOfMeasure" in item:
-            price_info.append(f"Per: {item['unitOfMeasure']}")
-        if "armRegionName" in item:
-            price_info.append(f"Region: {item['armRegionName']}")
-            
-        prices.append("\n".join(price_info))
-
-    summary = f"Found {len(all_items)} pricing items (showing all)"
-    if page_count >= max_pages and next_page_url:
-        summary = f"Found {len(all_items)} pricing items (limited to {max_pages} pages)"
+
+    summary = f"Found {listing.count} pricing items (showing all)"
+    if rest is not None:
+        cursor = encode_cursor(rest)
+        summary = (
+            f"Found {listing.count} pricing items (more results available; "
+            f"call get_azure_price_next with cursor \"{cursor}\" to continue)"
+        )
         
-    return f"{summary}\n\n" + "\n\n---\n\n".join(prices)
+    return listing.render(summary)
+
+
+async def collect_api_pages(url: str, listing: PriceListing) -> PriceContinuation | None:
+    """Add pages of a price API query to `listing`; return where to resume, if anywhere."""
+    deadline = time.monotonic() + AZURE_PRICE_TIME_BUDGET
+    next_page_url = ""
+    pages = iter_azure_price_pages(url, AZURE_PRICE_MAX_PAGES, AZURE_PRICE_PAGE_FANOUT)
+    async with aclosing(pages):
+        async for data, next_page_url in pages:
+            # Format items from this page as it arrives
+            listing.add(data.get("Items", []))
+            if listing.size >= AZURE_PRICE_MAX_CHARS or time.monotonic() >= deadline:
+                break
+    return PriceContinuation(next_page_url=next_page_url) if next_page_url else None
+
+
+async def collect_mirror_items(start: PriceContinuation, listing: PriceListing) -> PriceContinuation | None:
+    """Add items matching a filter from the local mirror to `listing`; return where to resume, if anywhere."""
+    limit = AZURE_PRICE_MIRROR_MAX_ITEMS
+    items = await asyncio.to_thread(price_mirror.query, start.where, limit + 1, start.offset)
+    for item in items[:limit]:
+        listing.add([item])
+        if listing.size >= AZURE_PRICE_MAX_CHARS:
+            break
+    if len(items) > listing.count:
+        return PriceContinuation(
+            where=start.where, offset=start.offset + listing.count, filter_expression=start.filter_expression
+        )
+    return None
+
+
+async def price_catalog_pages() -> AsyncIterator[list[dict[str, Any]]]:
+    """Yield the full price catalog page by page, for refreshing the mirror."""
+    if AZURE_PRICE_MIRROR_SOURCE:
+        yield load_fixture(AZURE_PRICE_MIRROR_SOURCE)
+        return
+    url = f"{AZURE_PRICE_API_BASE}?api-version={AZURE_PRICE_API_VERSION}"
+    next_page_url = url
+    pages = iter_azure_price_pages(url, sys.maxsize, AZURE_PRICE_PAGE_FANOUT, fetch=fetch_catalog_page)
+    async for data, next_page_url in pages:
+        yield data.get("Items", [])
+    if next_page_url:
+        raise RuntimeError(f"Azure price catalog download stopped early at {next_page_url}")
+
+
+_SKIP_PARAM = re.compile(r"([?&]\$skip=)\d+")
+
+
+async def iter_azure_price_pages(
+    url: str,
+    max_pages: int,
+    fanout: int = 0,
+    fetch: Callable[[str], Awaitable[dict[str, Any] | None]] | None = None,
+) -> AsyncIterator[tuple[dict[str, Any], str]]:
+    """Yield (page, NextPageLink) for up to `max_pages` pages of a price query, in order.
+
+    The first page is always fetched on its own. Its NextPageLink reveals the
+    `$skip` stride, so with `fanout` > 1 the following pages are requested
+    concurrently, keeping at most `fanout` requests in flight. Pages come
+    from `fetch`, by default the cached `make_azure_price_request`.
+    """
+    fetch = fetch or make_azure_price_request
+    data = await fetch(url)
+    if not data:
+        return
+    next_url = data.get("NextPageLink") or ""
+    yield data, next_url
+
+    skip = _SKIP_PARAM.search(next_url)
+    if fanout <= 1 or not skip:
+        for _ in range(max_pages - 1):
+            if not next_url:
+                return
+            data = await fetch(next_url)
+            if not data:
+                return
+            next_url = data.get("NextPageLink") or ""
+            yield data, next_url
+        return
+
+    stride = int(next_url[skip.end(1):skip.end()])
+    template = next_url
+    pending: deque[asyncio.Future] = deque()
+    next_page = 1
+    try:
+        while True:
+            while len(pending) < fanout and next_page < max_pages:
+                page_url = _SKIP_PARAM.sub(lambda m: f"{m.group(1)}{stride * next_page}", template)
+                pending.append(asyncio.ensure_future(fetch(page_url)))
+                next_page += 1
+            if not pending:
+                return
+            data = await pending.popleft()
+            if not data or not data.get("Items"):
+                return
+            next_url = data.get("NextPageLink") or ""
+            yield data, next_url
+            if not next_url:
+                return
+    finally:
+        for task in pending:
+            task.cancel()
+
 
 async def make_azure_price_request(url: str) -> dict[str, Any] | None:
     """Make a request to the Azure Price API with proper error handling."""
+    entry, status = await azure_price_cache.load(url)
+    if status == FRESH:
+        return entry.body
+
+    def fetch():
+        return inflight.do(canonical_url(url), lambda: fetch_azure_price(url))
+
+    if status == STALE:
+        azure_price_cache.revalidate(url, fetch)
+        return entry.body
+    return await fetch()
+
+
+async def fetch_catalog_page(url: str) -> dict[str, Any] | None:
+    """Fetch one catalog page for the mirror, bypassing the response caches and request coalescing."""
+    return await fetch_azure_price(url, upstream="azure_price_catalog", cache=None)
+
+
+async def fetch_azure_price(
+    url: str, upstream: str = "azure_price", cache: ResponseCache | None = azure_price_cache
+) -> dict[str, Any] | None:
+    """Fetch one page from the Azure Price API, storing it in `cache` if given."""
     headers = {
         "User-Agent": USER_AGENT,
         "Accept": "application/json",
         "Content-Type": "application/json"
     }   
-    async with httpx.AsyncClient() as client:
+    try:
+        response = await upstreams.get(upstream, url, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        if cache is not None:
+            cache.store(url, data, response.headers)
+        return data
+    except CircuitOpenError:
+        logger.warning("Azure price API unavailable, not fetching %s", url)
+        return None
+    except UpstreamThrottledError:
+        logger.warning("Too many queued Azure price requests, not fetching %s", url)
+        return None
+    except httpx.TimeoutException:
+        logger.warning("Timeout while fetching Azure price data from %s", url)
+        return None
+    except httpx.HTTPStatusError as e:
+        logger.warning(
+            "HTTP error %d while fetching Azure price data: %s", e.response.status_code, e.response.text
+        )
+        return None
+    except Exception as e:
+        logger.error("Error fetching Azure price data: %s", e)
+        return None
+
+
+# Outbound SSE buffering: bytes allowed to wait for a client, write coalescing window, and
+# how long one write may block before the client is considered too slow
+SSE_MAX_BUFFER_BYTES = env_int("SSE_MAX_BUFFER_BYTES", 1 << 20)
+SSE_FLUSH_DELAY = env_float("SSE_FLUSH_DELAY", 0.005)
+SSE_SEND_TIMEOUT = env_float("SSE_SEND_TIMEOUT", 30.0)
+# Session limits: open sessions per worker (0 for no limit), seconds without a client
+# message before a session is closed (0 to keep them), and quiet time before a heartbeat
+SSE_MAX_SESSIONS = env_int("SSE_MAX_SESSIONS", 1000)
+SSE_IDLE_TIMEOUT = env_float("SSE_IDLE_TIMEOUT", 30 * 60)
+SSE_HEARTBEAT_INTERVAL = env_float("SSE_HEARTBEAT_INTERVAL", 10.0)
+
+
+TOOL_CALL_SECONDS = metrics.REGISTRY.histogram(
+    "mcp_tool_call_duration_seconds", "Duration of MCP tool calls, by tool and outcome", ("tool", "outcome")
+)
+
+
+def instrument_tool_calls(mcp_server: Server) -> None:
+    """Time and trace every tool call handled by `mcp_server`, whichever transport it came in on."""
+    handler = mcp_server.request_handlers.get(types.CallToolRequest)
+    if handler is None or getattr(handler, "instrumented", False):
+        return
+
+    async def timed_handler(request: types.CallToolRequest) -> types.ServerResult:
         try:
-            response = await client.get(url, headers=headers, timeout=10.0)
-            response.raise_for_status()
-            return response.json()
-        except httpx.TimeoutException:
-            print(f"Timeout while fetching Azure price data from {url}")
-            return None
-        except httpx.HTTPStatusError as e:
-            print(f"HTTP error {e.response.status_code} while fetching Azure price data: {e.response.text}")
-            return None
-        except Exception as e:
-            print(f"Error fetching Azure price data: {str(e)}")
-            return None
+            request_id = mcp_server.request_context.request_id
+        except LookupError:
+            request_id = None
+        started = time.perf_counter()
+        outcome = "exception"
+        with tracing.tool_span(request.params.name, request_id) as span:
+            try:
+                result = await handler(request)
+                outcome = "error" if getattr(result.root, "isError", False) else "ok"
+                return result
+            finally:
+                TOOL_CALL_SECONDS.observe(time.perf_counter() - started, request.params.name, outcome)
+                tracing.set_attributes(span, **{"mcp.tool.outcome": outcome})
+
+    timed_handler.instrumented = True
+    mcp_server.request_handlers[types.CallToolRequest] = timed_handler
+
+
+def register_gauges(sse: TrackedSseTransport) -> None:
+    """Export point-in-time state (sessions, queues, caches) as gauges read at scrape time."""
+    registry = metrics.REGISTRY
+    registry.gauge("sse_sessions", "Open SSE sessions", callback=lambda: len(sse.sessions))
+    registry.gauge("sse_buffered_bytes", "Output bytes queued for SSE clients", callback=lambda: sse.buffered)
+    registry.gauge(
+        "upstream_queue_depth",
+        "Requests waiting for an upstream rate or concurrency slot",
+        ("upstream",),
+        callback=lambda: {(name,): limiter.waiting for name, limiter in upstreams.limiters.items()},
+    )
+    registry.gauge(
+        "upstream_circuit_open",
+        "Whether the upstream's circuit breaker is open",
+        ("upstream",),
+        callback=lambda: {(name,): float(breaker.is_open) for name, breaker in upstreams.breakers.items()},
+    )
+    registry.gauge("upstream_inflight_coalesced", "Distinct upstream fetches in flight", callback=lambda: len(inflight))
+    registry.gauge(
+        "cache_entries",
+        "Entries held by each in-process cache",
+        ("cache",),
+        callback=lambda: {
+            ("nws",): len(nws_cache),
+            ("azure_price",): len(azure_price_cache),
+            ("nws_points",): len(points_cache),
+        },
+    )
+
+
+async def handle_metrics(request: Request) -> Response:
+    families = metrics.REGISTRY.collect()
+    body = await asyncio.to_thread(metrics.render, families)
+    return Response(body, media_type=metrics.CONTENT_TYPE)
+
+
+class ResponseSent(Response):
+    """Returned by an endpoint that already wrote its response through the raw ASGI `send`."""
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    async def __call__(self, scope, receive, send) -> None:
+        pass
+
+
+class StreamableHttpEndpoint:
+    """ASGI endpoint handing requests to a StreamableHTTPSessionManager.
+
+    Starlette's Route passes raw ASGI calls to class instances (a bound
+    method would be wrapped as a request handler), so the exact path can be
+    served without Mount's redirect to a trailing slash.
+    """
+
+    def __init__(self, manager: StreamableHTTPSessionManager) -> None:
+        self.manager = manager
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.manager.handle_request(scope, receive, send)
 
 
-def create_starlette_app(mcp_server: Server, *, debug: bool = False) -> Starlette:
-    """Create a Starlette application that can server the provied mcp server with SSE."""
-    sse = SseServerTransport("/messages/")
+def create_starlette_app(
+    mcp_server: Server,
+    *,
+    debug: bool = False,
+    broker: SessionBroker | None = None,
+    streamable_http: bool | None = None,
+) -> Starlette:
+    """Create a Starlette application that can server the provied mcp server with SSE.
 
-    async def handle_sse(request: Request) -> None:
-        async with sse.connect_sse(
-                request.scope,
-                request.receive,
+    With a session broker (by default the one configured by SESSION_BROKER_URL),
+    messages can be posted to any worker sharing it, not only the one holding the session.
+    Unless disabled (STREAMABLE_HTTP=0), the same server is also exposed statelessly over
+    Streamable HTTP at /mcp.
+    """
+    broker = broker or broker_from_env()
+    limits = {"max_sessions": SSE_MAX_SESSIONS, "idle_timeout": SSE_IDLE_TIMEOUT}
+    sse = (
+        RoutedSseTransport("/messages/", broker, **limits)
+        if broker is not None
+        else TrackedSseTransport("/messages/", **limits)
+    )
+    instrument_tool_calls(mcp_server)
+    register_gauges(sse)
+
+    if streamable_http is None:
+        streamable_http = env_bool("STREAMABLE_HTTP", True)
+    http_manager = None
+    if streamable_http:
+        http_manager = StreamableHTTPSessionManager(
+            app=mcp_server, stateless=True, json_response=env_bool("STREAMABLE_HTTP_JSON", True)
+        )
+
+    async def handle_sse(request: Request) -> Response:
+        refused = None
+        try:
+            async with CoalescingSend(
                 request._send,  # noqa: SLF001
-        ) as (read_stream, write_stream):
-            await mcp_server.run(
-                read_stream,
-                write_stream,
-                mcp_server.create_initialization_options(),
+                max_buffer=SSE_MAX_BUFFER_BYTES,
+                flush_delay=SSE_FLUSH_DELAY,
+                send_timeout=SSE_SEND_TIMEOUT,
+                heartbeat=SSE_HEARTBEAT_INTERVAL,
+            ) as send:
+                async with sse.connect_sse(
+                        request.scope,
+                        request.receive,
+                        send,
+                ) as (read_stream, write_stream):
+                    await mcp_server.run(
+                        read_stream,
+                        write_stream,
+                        mcp_server.create_initialization_options(),
+                    )
+        except* SlowClientError as group:
+            logger.warning("Dropping SSE session for %s: %s", request.client, group.exceptions[0])
+        except* SessionLimitError as group:
+            refused = group.exceptions[0]
+        if refused is not None:
+            # Raised before anything was sent, so there is still a response to give
+            logger.warning("Refusing SSE session for %s: %s", request.client, refused)
+            return Response("Too many open sessions", status_code=503, headers={"Retry-After": "30"})
+        return ResponseSent()
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        await upstreams.start()
+        if alert_ingester is not None:
+            alert_ingester.start()
+        mirror_task = None
+        if price_mirror is not None:
+            mirror_task = asyncio.create_task(
+                keep_refreshed(price_mirror, price_catalog_pages, AZURE_PRICE_MIRROR_REFRESH)
             )
+        forward_task = None
+        if broker is not None:
+            forward_task = asyncio.create_task(sse.forward_messages())
+        reap_task = None
+        if SSE_IDLE_TIMEOUT > 0:
+            reap_task = asyncio.create_task(sse.reap_idle())
+        try:
+            if http_manager is not None:
+                async with http_manager.run():
+                    yield
+            else:
+                yield
+        finally:
+            tasks = [task for task in (reap_task, forward_task, mirror_task) if task is not None]
+            for task in tasks:
+                task.cancel()
+            # Wait for them to finish so none is left using the broker or mirror after shutdown
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if broker is not None:
+                await broker.aclose()
+            if alert_ingester is not None:
+                await alert_ingester.stop()
+            await upstreams.aclose()
+
+    routes = [
+        Route("/sse", endpoint=handle_sse),
+        Mount("/messages/", app=sse.handle_post_message),
+        Route("/metrics", endpoint=handle_metrics),
+    ]
+    if http_manager is not None:
+        # Both spellings, so clients that do not re-send a POST after a redirect work either way
+        endpoint = StreamableHttpEndpoint(http_manager)
+        routes += [Route("/mcp", endpoint=endpoint), Route("/mcp/", endpoint=endpoint)]
 
     return Starlette(
         debug=debug,
-        routes=[
-            Route("/sse", endpoint=handle_sse),
-            Mount("/messages/", app=sse.handle_post_message),
-        ],
+        lifespan=lifespan,
+        routes=routes,
     )
 
+def create_app() -> Starlette:
+    """Build the server from environment settings, for `uvicorn --factory haxumcp:create_app`.
+
+    uvicorn calls this in every worker process (e.g. with `--workers 4`), so
+    logging and tracing are set up here. uvicorn's own loggers are switched
+    to propagating to the root handler, as `log_config=None` does for
+    `uvicorn.run`.
+    """
+    configure_logging()
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    tracing.configure_tracing()
+    return create_starlette_app(mcp._mcp_server)  # noqa: SLF001
+
+
 @mcp.tool()
 async def count_chinese_characters(text: str) -> str:
     """Count the number of Chinese characters in a string. Use when the user asks about the word count.
@@ -214,16 +970,12 @@ async def count_chinese_characters(text: str) -> str:
     Args:
         text: The input text string containing Chinese characters
     """
-    url = "https://haxufunctions.azurewebsites.net/api/http_trigger"
-    params = {'text': text}
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, params=params, timeout=10.0)
-            response.raise_for_status()
-            return f"Chinese character count: {response.text}"
-        except Exception as e:
-            return f"Error counting Chinese characters: {str(e)}"
+    # Count large inputs in slices so other sessions get the event loop in between
+    count = 0
+    for start in range(0, len(text), CJK_COUNT_CHUNK):
+        count += count_cjk_characters(text[start:start + CJK_COUNT_CHUNK])
+        await asyncio.sleep(0)
+    return f"Chinese character count: {count}"
 
 if __name__ == "__main__":
     mcp_server = mcp._mcp_server  # noqa: WPS437
@@ -233,9 +985,24 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run MCP SSE-based server')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind to')
     parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (see SESSION_BROKER_URL)')
     args = parser.parse_args()
+    if args.workers > 1 and os.environ.get("SESSION_BROKER_URL", "local") == "local":
+        # Without a shared broker, most /messages/ POSTs would reach a worker that does not own the session
+        parser.error("--workers above 1 needs SESSION_BROKER_URL set to a Redis URL")
+
+    configure_logging()
+    if args.workers > 1:
+        # Each worker builds its own app; uvicorn needs an import string to start them
+        uvicorn.run(
+            "haxumcp:create_app", factory=True, workers=args.workers, host=args.host, port=args.port, log_config=None
+        )
+        sys.exit()
+
+    tracing.configure_tracing()
 
     # Bind SSE request handling to MCP server
     starlette_app = create_starlette_app(mcp_server, debug=True)
 
-    uvicorn.run(starlette_app, host=args.host, port=args.port)
+    # log_config=None lets uvicorn's loggers propagate to the queue-backed root handler
+    uvicorn.run(starlette_app, host=args.host, port=args.port, log_config=None)
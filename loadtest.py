@@ -0,0 +1,347 @@
+"""End-to-end load test for the SSE server, run fully offline against stubbed upstreams.
+
+Starts `haxumcp` in a child process with the NWS and Azure price APIs replaced
+by an in-process stub (see `stub_upstream`), opens concurrent SSE sessions
+against it and runs a weighted mix of tool calls, then reports throughput and
+latency percentiles per tool, and how upstream requests and cache lookups
+went according to the server's metrics.
+
+    uv run loadtest.py                                  # 20 sessions x 50 calls
+    uv run loadtest.py --sessions 200 --calls 20 --upstream-latency 50
+    uv run loadtest.py --mix get_forecast=1,count_chinese_characters=1
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import statistics
+import time
+
+import httpx
+
+DEFAULT_MIX = "get_alerts=3,get_forecast=3,get_azure_price=2,count_chinese_characters=2"
+
+STATES = ["CA", "NY", "TX", "WA", "FL", "CO", "AK", "HI"]
+LOCATIONS = [(47.6062, -122.3321), (40.7128, -74.006), (34.0522, -118.2437), (41.8781, -87.6298), (39.7392, -104.9903)]
+PRICE_FILTERS = [
+    "serviceName eq 'Virtual Machines' and armRegionName eq 'eastus'",
+    "contains(armSkuName, 'Standard_D2_v3') and armRegionName eq 'westeurope'",
+    "serviceName eq 'Storage' and priceType eq 'Consumption'",
+]
+TEXTS = ["床前明月光，疑是地上霜。举头望明月，低头思故乡。" * 20, "Azure 价格查询 returns 中文 results. " * 50]
+
+
+def stub_upstream(latency: float, max_age: int = 1):
+    """Return an httpx transport that answers NWS and Azure price requests with canned data after `latency` seconds.
+
+    Like the real NWS API, NWS responses carry `Cache-Control: max-age` and an
+    ETag, and a conditional request whose If-None-Match matches gets 304 Not
+    Modified. The price API, like the real one, sends no caching headers.
+    """
+
+    def nws_response(request: httpx.Request, payload: dict) -> httpx.Response:
+        body = json.dumps(payload, sort_keys=True).encode()
+        headers = {"Cache-Control": f"public, max-age={max_age}", "ETag": f'"{hashlib.sha1(body).hexdigest()}"'}
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, content=body, headers={**headers, "Content-Type": "application/geo+json"})
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        path = request.url.path
+        if request.url.host == "prices.azure.com":
+            items = [
+                {
+                    "productName": "Virtual Machines Dv3 Series",
+                    "skuName": f"D{n} v3",
+                    "armSkuName": f"Standard_D{n}_v3",
+                    "serviceName": "Virtual Machines",
+                    "retailPrice": 0.096 * n,
+                    "unitOfMeasure": "1 Hour",
+                    "armRegionName": "eastus",
+                    "priceType": "Consumption",
+                }
+                for n in (2, 4, 8, 16)
+            ]
+            return httpx.Response(200, json={"Items": items, "NextPageLink": None, "Count": len(items)})
+        if path.startswith("/points/"):
+            lat, lon = path.rsplit("/", 1)[-1].split(",")
+            grid = f"https://api.weather.gov/gridpoints/STUB/{lat},{lon}/forecast"
+            return nws_response(request, {"properties": {"forecast": grid}})
+        if path.endswith("/forecast"):
+            periods = [
+                {
+                    "name": name,
+                    "temperature": 50 + n,
+                    "temperatureUnit": "F",
+                    "windSpeed": "5 mph",
+                    "windDirection": "NW",
+                    "detailedForecast": "Partly cloudy, with a light breeze.",
+                }
+                for n, name in enumerate(["Tonight", "Monday", "Monday Night", "Tuesday", "Tuesday Night"])
+            ]
+            return nws_response(request, {"properties": {"periods": periods}})
+        if path.startswith("/alerts/active"):
+            if path.startswith("/alerts/active/area/"):
+                states = [path.rsplit("/", 1)[-1]]
+            elif "area" in request.url.params:
+                states = request.url.params["area"].split(",")
+            else:
+                states = STATES
+            features = [
+                {
+                    "id": f"urn:stub:{state}:{n}",
+                    "properties": {
+                        "id": f"urn:stub:{state}:{n}",
+                        "event": "Wind Advisory",
+                        "areaDesc": f"Somewhere in {state}",
+                        "severity": "Moderate",
+                        "description": "Gusty winds expected.",
+                        "instruction": "Secure loose objects.",
+                        "geocode": {"UGC": [f"{state}Z00{n}"]},
+                    },
+                }
+                for state in states if state
+                for n in range(2)
+            ]
+            return nws_response(request, {"features": features})
+        return httpx.Response(404, json={"detail": "not stubbed"})
+
+    return httpx.MockTransport(handler)
+
+
+def serve(port: int, latency: float, max_age: int) -> None:
+    """Child process: run the server with stubbed upstreams."""
+    import uvicorn
+
+    import haxumcp
+    from logging_setup import configure_logging
+
+    configure_logging()
+    haxumcp.upstreams._transport = stub_upstream(latency, max_age)  # noqa: SLF001
+    app = haxumcp.create_starlette_app(haxumcp.mcp._mcp_server)  # noqa: SLF001
+    uvicorn.run(app, host="127.0.0.1", port=port, log_config=None, log_level="warning")
+
+
+def tool_arguments(tool: str, rng: random.Random) -> dict:
+    if tool == "get_alerts":
+        return {"state": rng.choice(STATES)}
+    if tool == "get_forecast":
+        latitude, longitude = rng.choice(LOCATIONS)
+        return {"latitude": latitude, "longitude": longitude}
+    if tool == "get_azure_price":
+        return {"filter_expression": rng.choice(PRICE_FILTERS)}
+    return {"text": rng.choice(TEXTS)}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        tool, _, weight = part.partition("=")
+        weights[tool.strip()] = float(weight or 1)
+    return weights
+
+
+class Session:
+    """One MCP client session over SSE: a reader task matches responses to requests by id."""
+
+    def __init__(self, client: httpx.AsyncClient, base_url: str) -> None:
+        self.client = client
+        self.base_url = base_url
+        self.ids = itertools.count(1)
+        self.waiting: dict[int, asyncio.Future] = {}
+        self.endpoint: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+
+    async def read_events(self) -> None:
+        async with self.client.stream("GET", f"{self.base_url}/sse") as response:
+            response.raise_for_status()
+            event, data = None, []
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    self.dispatch(event, "\n".join(data))
+                    event, data = None, []
+
+    def dispatch(self, event: str | None, data: str) -> None:
+        if event == "endpoint":
+            self.endpoint.set_result(data)
+            return
+        message = json.loads(data)
+        future = self.waiting.pop(message.get("id"), None)
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    async def post(self, message: dict) -> None:
+        response = await self.client.post(self.base_url + await self.endpoint, json=message)
+        response.raise_for_status()
+
+    async def request(self, method: str, params: dict) -> dict:
+        request_id = next(self.ids)
+        future = self.waiting[request_id] = asyncio.get_running_loop().create_future()
+        await self.post({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        return await future
+
+    async def initialize(self) -> None:
+        await self.request(
+            "initialize",
+            {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "loadtest", "version": "1"}},
+        )
+        await self.post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+
+async def run_session(
+    base_url: str, calls: int, weights: dict[str, float], seed: int, timings: dict[str, list[float]],
+    errors: dict[str, int], timeout: float,
+) -> None:
+    rng = random.Random(seed)
+    tools, cumulative = list(weights), list(itertools.accumulate(weights.values()))
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        session = Session(client, base_url)
+        reader = asyncio.create_task(session.read_events())
+        try:
+            await asyncio.wait_for(session.initialize(), timeout)
+            for _ in range(calls):
+                tool = rng.choices(tools, cum_weights=cumulative)[0]
+                started = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(
+                        session.request("tools/call", {"name": tool, "arguments": tool_arguments(tool, rng)}), timeout
+                    )
+                except (TimeoutError, httpx.HTTPError):
+                    errors[tool] += 1
+                    continue
+                if "error" in result or result.get("result", {}).get("isError"):
+                    errors[tool] += 1
+                else:
+                    timings[tool].append(time.perf_counter() - started)
+        finally:
+            reader.cancel()
+
+
+def percentiles(timings: list[float]) -> tuple[float, float, float]:
+    if len(timings) < 2:
+        value = timings[0] if timings else float("nan")
+        return value, value, value
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def report(timings: dict[str, list[float]], errors: dict[str, int], elapsed: float) -> None:
+    print(f"{'tool':<26} {'calls':>7} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for tool in sorted(set(timings) | set(errors)):
+        p50, p95, p99 = percentiles(timings[tool])
+        print(f"{tool:<26} {len(timings[tool]):>7} {errors[tool]:>6} {p50 * 1000:9.1f} {p95 * 1000:9.1f} {p99 * 1000:9.1f}")
+    everything = [t for values in timings.values() for t in values]
+    p50, p95, p99 = percentiles(everything)
+    completed = len(everything)
+    print(f"{'all':<26} {completed:>7} {sum(errors.values()):>6} {p50 * 1000:9.1f} {p95 * 1000:9.1f} {p99 * 1000:9.1f}")
+    print(f"\n{completed} calls in {elapsed:.2f}s: {completed / elapsed:.1f} calls/s")
+
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def report_upstreams(metrics_text: str) -> None:
+    """Summarize upstream responses by status and cache lookups by result from a /metrics scrape."""
+    upstream_calls: dict[tuple[str, str], float] = defaultdict(float)
+    cache_lookups: dict[tuple[str, str], float] = defaultdict(float)
+    for line in metrics_text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.group(1), dict(re.findall(r'(\w+)="([^"]*)"', match.group(2))), float(match.group(3))
+        if name == "upstream_request_duration_seconds_count":
+            upstream_calls[labels["upstream"], labels["status"]] += value
+        elif name == "cache_requests_total":
+            cache_lookups[labels["cache"], labels["result"]] += value
+    if upstream_calls:
+        print("\nupstream responses: " + ", ".join(
+            f"{upstream} {status}: {count:.0f}" for (upstream, status), count in sorted(upstream_calls.items())
+        ))
+    if cache_lookups:
+        print("cache lookups: " + ", ".join(
+            f"{cache} {result}: {count:.0f}" for (cache, result), count in sorted(cache_lookups.items())
+        ))
+
+
+async def wait_until_ready(base_url: str, deadline: float) -> None:
+    async with httpx.AsyncClient(timeout=1.0) as client:
+        while True:
+            try:
+                if (await client.get(f"{base_url}/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("server did not start")
+            await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace, base_url: str) -> None:
+    weights = parse_mix(args.mix)
+    timings: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    await wait_until_ready(base_url, time.monotonic() + 30)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(base_url, args.calls, weights, args.seed + n, timings, errors, args.timeout)
+        for n in range(args.sessions)
+    ))
+    report(timings, errors, time.perf_counter() - started)
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        report_upstreams((await client.get(f"{base_url}/metrics")).text)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the SSE MCP server against stubbed upstreams")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent SSE sessions")
+    parser.add_argument("--calls", type=int, default=50, help="Tool calls per session, made one after another")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted tool mix, e.g. get_alerts=3,get_forecast=1")
+    parser.add_argument("--upstream-latency", type=float, default=20.0, help="Stubbed upstream latency in ms")
+    parser.add_argument(
+        "--upstream-max-age", type=int, default=1, help="Cache-Control max-age of stubbed NWS responses, in seconds"
+    )
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a call counts as failed")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the call mix and arguments")
+    parser.add_argument("--url", help="Load an already running server instead (its upstreams are not stubbed)")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run(args, args.url.rstrip("/")))
+        return
+
+    port = free_port()
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(port, args.upstream_latency / 1000, args.upstream_max_age), daemon=True
+    )
+    server.start()
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+    finally:
+        server.terminate()
+        server.join(5)
+        if server.is_alive():
+            server.kill()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
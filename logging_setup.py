@@ -0,0 +1,158 @@
+"""Non-blocking, structured logging for the server.
+
+Log calls on the event loop only put the record on a queue; a background
+thread formats it as one JSON object per line and writes it out. Records are
+sampled per event, so a flood of identical errors cannot swamp the output,
+and long arguments such as upstream response bodies are truncated.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+from config import env_float, env_int
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+def truncate(value: object, limit: int, keep_end: bool = False) -> object:
+    if isinstance(value, (str, bytes)) and len(value) > limit:
+        if keep_end:
+            return f"[{len(value) - limit} more] ...{value[-limit:]!s}"
+        return f"{value[:limit]!s}... [{len(value) - limit} more]"
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """Passes the first `burst` records of each event per `window` seconds, then one in `rate`.
+
+    An event is the logger name and message template, or an explicit `event`
+    passed through `extra`. The next record let through for an event carries
+    the number of records dropped before it as `sampled_out`.
+    """
+
+    def __init__(self, burst: int = 10, window: float = 60.0, rate: int = 100, clock=time.monotonic) -> None:
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.rate = max(rate, 1)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # event -> [window start, records seen in window, records dropped since the last one passed]
+        self._events: dict[str, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.CRITICAL:
+            return True
+        key = getattr(record, "event", None) or f"{record.name}:{record.msg}"
+        now = self._clock()
+        with self._lock:
+            state = self._events.get(key)
+            if state is None or now - state[0] >= self.window:
+                if len(self._events) > 10_000:
+                    self._events.clear()
+                state = self._events[key] = [now, 0, state[2] if state else 0]
+            state[1] += 1
+            seen = state[1]
+            if seen > self.burst and (seen - self.burst) % self.rate:
+                state[2] += 1
+                return False
+            dropped, state[2] = state[2], 0
+        if dropped:
+            record.sampled_out = dropped
+        return True
+
+
+class TruncatingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that caps the length of message arguments, extra fields and tracebacks before enqueueing.
+
+    Like QueueHandler.prepare, the arguments are merged into the message, but
+    the traceback and stack are kept apart in `exc_text` and `stack_info`
+    (truncated to their last characters, where the error is) for the
+    formatter on the other side of the queue.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_field_chars: int) -> None:
+        super().__init__(log_queue)
+        self.max_field_chars = max_field_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        limit = self.max_field_chars
+        record = copy.copy(record)
+        if isinstance(record.args, tuple):
+            record.args = tuple(truncate(arg, limit) for arg in record.args)
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS:
+                setattr(record, name, truncate(value, limit))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = truncate(record.exc_text, limit, keep_end=True) or None
+        record.stack_info = truncate(record.stack_info, limit, keep_end=True) or None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object, including any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((name, value) for name, value in vars(record).items() if name not in _RECORD_ATTRS)
+        # TruncatingQueueHandler has already turned exc_info into (truncated) text
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background writer, configured from LOG_* variables.
+
+    Replaces any handlers already on the root logger. The listener is stopped,
+    flushing queued records, at interpreter exit.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = TruncatingQueueHandler(log_queue, env_int("LOG_MAX_FIELD_CHARS", 2000))
+    handler.addFilter(
+        SamplingFilter(
+            burst=env_int("LOG_SAMPLE_BURST", 10),
+            window=env_float("LOG_SAMPLE_WINDOW", 60.0),
+            rate=env_int("LOG_SAMPLE_RATE", 100),
+        )
+    )
+
+    output = logging.StreamHandler(sys.stderr)
+    if os.environ.get("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
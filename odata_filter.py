@@ -0,0 +1,298 @@
+"""Parser and local evaluator for the OData `$filter` subset used by the Azure Retail Prices API.
+
+Supported syntax:
+
+    field eq 'text'            comparisons: eq ne gt ge lt le
+    contains(field, 'text')    string functions: contains startswith endswith
+    ... and ... / ... or ...   with `not` and parentheses for grouping
+
+Literals are single-quoted strings ('' escapes a quote), numbers, dates and
+date-times (compared as ISO 8601 text), true, false and null. A parsed filter
+is turned into a SQL WHERE clause for the local price mirror; a comparison
+between a field and a literal of another type matches nothing, as in the API.
+
+Valid OData that is outside this subset (other functions, arithmetic, `in`,
+navigation paths) raises UnsupportedFilterError rather than a plain
+FilterSyntaxError, so callers can pass such filters on to the API unchanged.
+"""
+
+from dataclasses import dataclass
+import re
+from typing import Any, Callable, Union
+
+
+class FilterSyntaxError(ValueError):
+    """Raised when a filter expression is malformed or uses unsupported syntax."""
+
+    def __init__(self, message: str, position: int) -> None:
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+class UnsupportedFilterError(FilterSyntaxError):
+    """Raised for OData constructs the API accepts but this parser does not evaluate."""
+
+
+@dataclass(frozen=True)
+class Comparison:
+    field: str
+    op: str
+    value: Any
+
+
+@dataclass(frozen=True)
+class Call:
+    function: str
+    field: str
+    value: str
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: "FilterNode"
+
+
+@dataclass(frozen=True)
+class BoolOp:
+    op: str
+    operands: tuple["FilterNode", ...]
+
+
+FilterNode = Union[Comparison, Call, Not, BoolOp]
+
+COMPARISONS = ("eq", "ne", "gt", "ge", "lt", "le")
+FUNCTIONS = ("contains", "startswith", "endswith")
+
+# OData operators and functions outside the supported subset
+_UNSUPPORTED_OPERATORS = {"in", "has", "add", "sub", "mul", "div", "mod", "any", "all"}
+# Characters valid OData can start an operand with (negation, $it/$root, parameter aliases)
+_UNSUPPORTED_PREFIXES = set("-$@")
+# Characters valid OData can put right after a field name (navigation paths, qualified names)
+_UNSUPPORTED_SUFFIXES = set("/.")
+
+_TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<datetime>\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:\d{2})?)?)
+    | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+    | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<punct>[(),])
+    | (?P<other>[^'])
+    """,
+    re.VERBOSE,
+)
+
+_KEYWORDS = {"and", "or", "not", "true", "false", "null"} | set(COMPARISONS)
+_LITERALS = {"true": True, "false": False, "null": None}
+
+
+@dataclass(frozen=True)
+class _Token:
+    kind: str
+    text: str
+    position: int
+
+
+def _tokenize(text: str) -> list[_Token]:
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise FilterSyntaxError("Unterminated string literal", pos)
+        kind = match.lastgroup
+        if kind != "ws":
+            value = match.group()
+            if kind == "name" and value.lower() in _KEYWORDS:
+                kind, value = "keyword", value.lower()
+            tokens.append(_Token(kind, value, pos))
+        pos = match.end()
+    tokens.append(_Token("end", "", len(text)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str) -> None:
+        self.tokens = _tokenize(text)
+        self.index = 0
+
+    @property
+    def current(self) -> _Token:
+        return self.tokens[self.index]
+
+    def advance(self) -> _Token:
+        token = self.current
+        self.index += 1
+        return token
+
+    def accept(self, kind: str, text: str | None = None) -> _Token | None:
+        token = self.current
+        if token.kind == kind and (text is None or token.text == text):
+            return self.advance()
+        return None
+
+    def expect(self, kind: str, text: str | None = None, what: str | None = None) -> _Token:
+        token = self.accept(kind, text)
+        if token is None:
+            found = self.current.text or "end of filter"
+            raise FilterSyntaxError(f"Expected {what or text or kind}, found {found!r}", self.current.position)
+        return token
+
+    def parse(self) -> FilterNode:
+        if self.current.kind == "end":
+            raise FilterSyntaxError("Empty filter expression", 0)
+        node = self.parse_or()
+        if self.current.kind != "end":
+            raise FilterSyntaxError(f"Unexpected {self.current.text!r}", self.current.position)
+        return node
+
+    def parse_or(self) -> FilterNode:
+        operands = [self.parse_and()]
+        while self.accept("keyword", "or"):
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else BoolOp("or", tuple(operands))
+
+    def parse_and(self) -> FilterNode:
+        operands = [self.parse_unary()]
+        while self.accept("keyword", "and"):
+            operands.append(self.parse_unary())
+        return operands[0] if len(operands) == 1 else BoolOp("and", tuple(operands))
+
+    def parse_unary(self) -> FilterNode:
+        if self.accept("keyword", "not"):
+            return Not(self.parse_unary())
+        if self.accept("punct", "("):
+            node = self.parse_or()
+            self.expect("punct", ")")
+            return node
+        self.reject_unsupported(_UNSUPPORTED_PREFIXES)
+        name = self.expect("name", what="field name or function")
+        if self.accept("punct", "("):
+            return self.parse_call(name)
+        self.reject_unsupported(_UNSUPPORTED_SUFFIXES)
+        op = self.current
+        if op.kind == "name" and op.text.lower() in _UNSUPPORTED_OPERATORS:
+            raise UnsupportedFilterError(f"Unsupported operator {op.text!r}", op.position)
+        if op.kind != "keyword" or op.text not in COMPARISONS:
+            raise FilterSyntaxError(
+                f"Expected comparison operator after {name.text!r}, found {op.text or 'end of filter'!r}", op.position
+            )
+        self.advance()
+        return Comparison(name.text, op.text, self.parse_literal())
+
+    def reject_unsupported(self, characters: set[str]) -> None:
+        """Raise UnsupportedFilterError if the current token is one of `characters`.
+
+        Called only where valid OData may use them; anywhere else these
+        characters fall through to a FilterSyntaxError.
+        """
+        token = self.current
+        if token.kind == "other" and token.text in characters:
+            raise UnsupportedFilterError(f"Unsupported syntax {token.text!r}", token.position)
+
+    def parse_call(self, name: _Token) -> FilterNode:
+        function = name.text.lower()
+        if function not in FUNCTIONS:
+            raise UnsupportedFilterError(f"Unsupported function {name.text!r}", name.position)
+        self.reject_unsupported(_UNSUPPORTED_PREFIXES)
+        field_token = self.expect("name", what="field name")
+        if self.current.kind == "punct" and self.current.text == "(":
+            raise UnsupportedFilterError(f"Unsupported function {field_token.text!r}", field_token.position)
+        self.reject_unsupported(_UNSUPPORTED_SUFFIXES)
+        field = field_token.text
+        self.expect("punct", ",")
+        literal = self.current
+        value = self.parse_literal()
+        if not isinstance(value, str):
+            raise FilterSyntaxError(f"{function}() expects a string literal", literal.position)
+        self.expect("punct", ")")
+        return Call(function, field, value)
+
+    def parse_literal(self) -> Any:
+        token = self.advance()
+        if token.kind == "string":
+            return token.text[1:-1].replace("''", "'")
+        if token.kind == "datetime":
+            return token.text
+        if token.kind == "number":
+            return int(token.text) if re.fullmatch(r"-?\d+", token.text) else float(token.text)
+        if token.kind == "keyword" and token.text in _LITERALS:
+            return _LITERALS[token.text]
+        raise FilterSyntaxError(f"Expected a literal value, found {token.text or 'end of filter'!r}", token.position)
+
+
+def parse_filter(text: str) -> FilterNode:
+    """Parse an OData filter expression, raising FilterSyntaxError if it is malformed."""
+    return _Parser(text).parse()
+
+
+_SQL_OPERATORS = {"eq": "=", "ne": "=", "gt": ">", "ge": ">=", "lt": "<", "le": "<="}
+
+
+def _sql_type_guard(value: Any, type_expr: str) -> str | None:
+    """SQL that is true when a field holds a value of the same type as the literal `value`.
+
+    SQLite compares text with numbers and coerces numbers to text inside
+    string functions, so without this a filter could match items the API
+    would not. Returns None for null, which has no type to check.
+    """
+    if isinstance(value, bool):
+        return f"{type_expr} = '{'true' if value else 'false'}'"
+    if isinstance(value, (int, float)):
+        return f"{type_expr} IN ('integer', 'real')"
+    if isinstance(value, str):
+        return f"{type_expr} = 'text'"
+    return None
+
+
+def to_sql(
+    node: FilterNode, column: Callable[[str], str], column_type: Callable[[str], str] | None = None
+) -> tuple[str, list[Any]]:
+    """Translate a parsed filter into a SQLite WHERE clause and its parameters.
+
+    `column` maps a field name to the SQL expression that holds its value, and
+    `column_type` to a never-NULL one naming its type as `json_type()` does
+    (by default `typeof()` of the column, which cannot tell booleans from
+    integers).
+    Every comparison is guarded by the type of its literal and is never NULL,
+    so `not` matches missing fields and the bare `column = ?` term can still
+    use an index on the column.
+    """
+    column_type = column_type or (lambda field: f"typeof({column(field)})")
+    if isinstance(node, BoolOp):
+        clauses, params = [], []
+        for operand in node.operands:
+            clause, operand_params = to_sql(operand, column, column_type)
+            clauses.append(f"({clause})")
+            params.extend(operand_params)
+        return f" {node.op.upper()} ".join(clauses), params
+    if isinstance(node, Not):
+        clause, params = to_sql(node.operand, column, column_type)
+        return f"NOT ({clause})", params
+
+    expr, guard = column(node.field), _sql_type_guard(node.value, column_type(node.field))
+    if isinstance(node, Call):
+        if node.function == "contains":
+            return f"{guard} AND instr({expr}, ?) > 0", [node.value]
+        if node.function == "endswith":
+            return f"{guard} AND substr({expr}, length({expr}) - ? + 1) = ?", [len(node.value), node.value]
+        return f"{guard} AND substr({expr}, 1, ?) = ?", [len(node.value), node.value]
+
+    if node.value is None:
+        if node.op == "eq":
+            return f"{expr} IS NULL", []
+        if node.op == "ne":
+            return f"{expr} IS NOT NULL", []
+        # null is not ordered against anything
+        return "0", []
+    if isinstance(node.value, bool):
+        if node.op not in ("eq", "ne"):
+            return "0", []
+        # true and false are distinct JSON types, so the guard alone decides
+        clause, params = guard, []
+    else:
+        clause, params = f"{guard} AND {expr} {_SQL_OPERATORS[node.op]} ?", [node.value]
+    if node.op == "ne":
+        return f"NOT ({clause})", params
+    return clause, params
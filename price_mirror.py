@@ -0,0 +1,225 @@
+"""Local, indexed mirror of the Azure Retail Prices catalog.
+
+The catalog is stored in SQLite with the item JSON alongside indexed copies of
+the fields price queries filter on most, so lookups take milliseconds instead
+of several paginated round-trips to prices.azure.com.
+
+Several server processes (e.g. uvicorn workers) may share one mirror file: a
+lock file next to it lets only one of them refresh at a time, and the others
+pick up its result from the database.
+"""
+
+import asyncio
+from contextlib import contextmanager
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterable, Iterable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where each mirror file should have a single server process
+    fcntl = None
+
+from odata_filter import FilterNode, to_sql
+
+logger = logging.getLogger(__name__)
+
+# Item fields that get their own indexed column
+INDEXED_FIELDS = ("armRegionName", "armSkuName", "serviceName", "priceType")
+
+_COLUMNS = ", ".join(f"{field} TEXT" for field in INDEXED_FIELDS)
+
+
+def _column(field: str) -> str:
+    # Field names come from the filter tokenizer, so they are plain identifiers
+    return field if field in INDEXED_FIELDS else f"json_extract(item, '$.{field}')"
+
+
+def _column_type(field: str) -> str:
+    # json_type tells true/false apart from numbers; indexed columns only hold text
+    return f"typeof({field})" if field in INDEXED_FIELDS else f"coalesce(json_type(item, '$.{field}'), 'null')"
+
+
+class PriceMirror:
+    """An on-disk copy of the price catalog that can be rebuilt while it is being queried.
+
+    A refresh loads into a staging table and swaps it in with one
+    transaction, so readers always see a complete catalog. The connection is
+    shared between threads behind a lock; call the blocking methods through
+    `asyncio.to_thread` from async code. `refreshed_at` and `ready` are kept
+    in memory and never block; `sync` re-reads them after another process
+    refreshes the file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._create_table("prices")
+        self._create_indexes("prices")
+        self._refreshed_at: float | None = None
+        self.sync()
+
+    def _create_table(self, name: str) -> None:
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {name} (id INTEGER PRIMARY KEY, {_COLUMNS}, item TEXT NOT NULL)")
+
+    def _create_indexes(self, table: str) -> None:
+        for field in INDEXED_FIELDS:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table} ({field})")
+
+    @property
+    def refreshed_at(self) -> float | None:
+        """Wall-clock time of the last completed refresh, or None if the mirror was never loaded."""
+        return self._refreshed_at
+
+    @property
+    def ready(self) -> bool:
+        return self._refreshed_at is not None
+
+    def sync(self) -> float | None:
+        """Re-read the refresh time from the database, which another process may have updated."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+        self._refreshed_at = float(row[0]) if row else None
+        return self._refreshed_at
+
+    @contextmanager
+    def _refresh_lock(self) -> Iterator[bool]:
+        """Hold `<path>.lock` exclusively while refreshing; yields False if another process holds it."""
+        if fcntl is None or self.path == ":memory:":
+            yield True
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            # Closing the file releases the lock
+            yield True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+    def begin_refresh(self) -> None:
+        with self._lock:
+            self._db.execute("DROP TABLE IF EXISTS prices_staging")
+            self._create_table("prices_staging")
+
+    def add_items(self, items: Iterable[dict[str, Any]]) -> None:
+        rows = [tuple(item.get(field) for field in INDEXED_FIELDS) + (json.dumps(item),) for item in items]
+        placeholders = ", ".join("?" for _ in range(len(INDEXED_FIELDS) + 1))
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    f"INSERT INTO prices_staging ({', '.join(INDEXED_FIELDS)}, item) VALUES ({placeholders})", rows
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def commit_refresh(self) -> None:
+        """Index the staging table and atomically make it the live catalog."""
+        refreshed_at = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DROP TABLE IF EXISTS prices")
+                self._db.execute("ALTER TABLE prices_staging RENAME TO prices")
+                self._create_indexes("prices")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed_at', ?)", (str(refreshed_at),)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._refreshed_at = refreshed_at
+
+    async def refresh(self, pages: AsyncIterable[list[dict[str, Any]]]) -> int | None:
+        """Rebuild the mirror from an async stream of item pages; returns the number of items loaded.
+
+        If the stream raises or yields nothing, the current catalog is kept.
+        Returns None without reading `pages` if another process is refreshing
+        the same file, or has finished doing so since this mirror last synced.
+        """
+        seen = self._refreshed_at
+        with self._refresh_lock() as acquired:
+            if not acquired or await asyncio.to_thread(self.sync) != seen:
+                return None
+            await asyncio.to_thread(self.begin_refresh)
+            count = 0
+            async for items in pages:
+                await asyncio.to_thread(self.add_items, items)
+                count += len(items)
+            if not count:
+                raise ValueError("price catalog source returned no items")
+            await asyncio.to_thread(self.commit_refresh)
+        return count
+
+    def query(
+        self, where: FilterNode | None = None, limit: int | None = None, offset: int = 0
+    ) -> list[dict[str, Any]]:
+        """Return the items matching a parsed OData filter, in catalog order."""
+        sql = "SELECT item FROM prices"
+        params: list[Any] = []
+        if where is not None:
+            clause, params = to_sql(where, _column, _column_type)
+            sql += f" WHERE {clause}"
+        sql += " ORDER BY id"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def load_fixture(path: str) -> list[dict[str, Any]]:
+    """Read a catalog snapshot saved as a JSON list of items or as a price API page ({"Items": [...]})."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["Items"] if isinstance(data, dict) else data
+
+
+async def keep_refreshed(mirror: PriceMirror, pages_factory, interval: float, poll: float = 60.0) -> None:
+    """Keep the mirror no older than `interval` seconds until cancelled.
+
+    `pages_factory` returns a fresh async iterable of item pages on each call.
+    Every `poll` seconds the refresh time is re-read from the database, so a
+    process sharing the file with the one that refreshes it notices new
+    catalogs and only downloads one itself when a refresh is overdue. A
+    failed attempt is retried after another `interval`.
+    """
+    last_attempt = 0.0
+    while True:
+        await asyncio.to_thread(mirror.sync)
+        due = max(mirror.refreshed_at or 0.0, last_attempt) + interval
+        if time.time() >= due:
+            started = time.monotonic()
+            try:
+                count = await mirror.refresh(pages_factory())
+                if count is not None:
+                    last_attempt = time.time()
+                    logger.info(
+                        "Azure price mirror refreshed with %d items in %.1fs", count, time.monotonic() - started
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                last_attempt = time.time()
+                logger.exception("Azure price mirror refresh failed")
+        await asyncio.sleep(max(min(poll, due - time.time()), 0) or poll)
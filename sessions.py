@@ -0,0 +1,417 @@
+"""Bookkeeping and cross-worker routing for SSE sessions.
+
+`TrackedSseTransport` keeps a record of every open session, enforces a
+session limit and closes sessions that have gone idle.
+
+`SseServerTransport` keeps each session's read stream in the memory of the
+process that accepted the SSE connection, so with several uvicorn workers or
+replicas a client's POST can land on a worker that does not own its session.
+`RoutedSseTransport` records session ownership in a `SessionBroker` and hands
+messages for sessions owned elsewhere to the broker, which delivers them to
+the owning worker.
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator
+from uuid import UUID, uuid4
+
+import anyio
+from mcp import types
+from mcp.server.sse import SseServerTransport
+from mcp.shared.message import SessionMessage
+from pydantic import ValidationError
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from sse_writer import CoalescingSend
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBroker(ABC):
+    """Shared record of which worker owns each session, plus a message channel per worker."""
+
+    @abstractmethod
+    async def claim(self, session_id: str, worker_id: str) -> None:
+        """Record `worker_id` as the owner of `session_id`."""
+
+    @abstractmethod
+    async def release(self, session_id: str) -> None:
+        """Forget `session_id` once its SSE stream has closed."""
+
+    @abstractmethod
+    async def owner(self, session_id: str) -> str | None:
+        """Return the worker that owns `session_id`, or None if no worker does."""
+
+    @abstractmethod
+    async def publish(self, worker_id: str, session_id: str, message: str) -> None:
+        """Deliver a serialized JSON-RPC message to the worker that owns the session."""
+
+    @abstractmethod
+    def subscribe(self, worker_id: str) -> AsyncIterator[tuple[str, str]]:
+        """Yield (session_id, message) pairs published to `worker_id`."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class LocalBroker(SessionBroker):
+    """In-memory broker for several transports in one process, e.g. workers simulated in tests."""
+
+    def __init__(self) -> None:
+        self._owners: dict[str, str] = {}
+        self._queues: defaultdict[str, asyncio.Queue[tuple[str, str]]] = defaultdict(asyncio.Queue)
+
+    async def claim(self, session_id: str, worker_id: str) -> None:
+        self._owners[session_id] = worker_id
+
+    async def release(self, session_id: str) -> None:
+        self._owners.pop(session_id, None)
+
+    async def owner(self, session_id: str) -> str | None:
+        return self._owners.get(session_id)
+
+    async def publish(self, worker_id: str, session_id: str, message: str) -> None:
+        self._queues[worker_id].put_nowait((session_id, message))
+
+    async def subscribe(self, worker_id: str) -> AsyncIterator[tuple[str, str]]:
+        queue = self._queues[worker_id]
+        while True:
+            yield await queue.get()
+
+
+class RedisBroker(SessionBroker):
+    """Broker backed by Redis: ownership in expiring keys, forwarding over one pub/sub channel per worker.
+
+    Requires the `redis` package. Ownership keys expire after `session_ttl`
+    seconds so sessions of a worker that died are eventually forgotten.
+    """
+
+    def __init__(self, url: str, prefix: str = "haxumcp", session_ttl: int = 24 * 60 * 60) -> None:
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.session_ttl = session_ttl
+
+    def _owner_key(self, session_id: str) -> str:
+        return f"{self.prefix}:session:{session_id}"
+
+    def _channel(self, worker_id: str) -> str:
+        return f"{self.prefix}:worker:{worker_id}"
+
+    async def claim(self, session_id: str, worker_id: str) -> None:
+        await self._redis.set(self._owner_key(session_id), worker_id, ex=self.session_ttl)
+
+    async def release(self, session_id: str) -> None:
+        await self._redis.delete(self._owner_key(session_id))
+
+    async def owner(self, session_id: str) -> str | None:
+        return await self._redis.get(self._owner_key(session_id))
+
+    async def publish(self, worker_id: str, session_id: str, message: str) -> None:
+        await self._redis.publish(self._channel(worker_id), f"{session_id} {message}")
+
+    async def subscribe(self, worker_id: str) -> AsyncIterator[tuple[str, str]]:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self._channel(worker_id))
+        try:
+            async for item in pubsub.listen():
+                if item["type"] == "message":
+                    session_id, _, message = item["data"].partition(" ")
+                    yield session_id, message
+        finally:
+            await pubsub.aclose()
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+
+def broker_from_env() -> SessionBroker | None:
+    """Build the broker named by SESSION_BROKER_URL (`redis://...` or `local`), if any."""
+    url = os.environ.get("SESSION_BROKER_URL")
+    if not url:
+        return None
+    if url == "local":
+        return LocalBroker()
+    return RedisBroker(url, prefix=os.environ.get("SESSION_BROKER_PREFIX", "haxumcp"))
+
+
+class SessionLimitError(Exception):
+    """Raised when a new SSE session would exceed the configured maximum."""
+
+
+@dataclass
+class SessionInfo:
+    """One open SSE session and what it is holding on to."""
+
+    session_id: str
+    client: str
+    opened_at: float
+    last_active: float
+    messages_in: int = 0
+    bytes_in: int = 0
+    output: CoalescingSend | None = None
+    cancel_scope: anyio.CancelScope = field(default_factory=anyio.CancelScope)
+
+    @property
+    def buffered(self) -> int:
+        """Bytes of output queued for the client and not yet written."""
+        return self.output.buffered if self.output is not None else 0
+
+    @property
+    def bytes_out(self) -> int:
+        return self.output.sent if self.output is not None else 0
+
+
+class TrackedSseTransport(SseServerTransport):
+    """SSE transport that records open sessions, caps their number and reaps idle ones.
+
+    A session is idle when its client has posted nothing for `idle_timeout`
+    seconds; `reap_idle` closes such sessions and should run for the lifetime
+    of the app.
+    """
+
+    def __init__(
+        self, endpoint: str, max_sessions: int = 0, idle_timeout: float = 0.0, clock=time.monotonic
+    ) -> None:
+        super().__init__(endpoint)
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self.sessions: dict[UUID, SessionInfo] = {}
+
+    @property
+    def full(self) -> bool:
+        return bool(self.max_sessions) and len(self.sessions) >= self.max_sessions
+
+    @property
+    def buffered(self) -> int:
+        """Output bytes queued across all sessions."""
+        return sum(info.buffered for info in self.sessions.values())
+
+    async def session_opened(self, session_id: UUID) -> None:
+        pass
+
+    async def session_closed(self, session_id: UUID) -> None:
+        pass
+
+    @asynccontextmanager
+    async def connect_sse(self, scope: Scope, receive: Receive, send: Send):
+        if self.full:
+            raise SessionLimitError(f"{len(self.sessions)} SSE sessions already open")
+        client = scope.get("client")
+        now = self._clock()
+        info = SessionInfo(
+            "", f"{client[0]}:{client[1]}" if client else "unknown", now, now,
+            output=send if isinstance(send, CoalescingSend) else None,
+        )
+        # Cancelling the scope ends the session, its response included
+        with info.cancel_scope:
+            before = set(self._read_stream_writers)
+            async with super().connect_sse(scope, receive, send) as streams:
+                session_id = self._find_session(streams[0], set(self._read_stream_writers) - before)
+                info.session_id = session_id.hex
+                self.sessions[session_id] = info
+                # Inherited by the tasks the MCP server starts for this session
+                token = tracing.session_id_var.set(session_id.hex)
+                try:
+                    await self.session_opened(session_id)
+                    yield streams
+                finally:
+                    tracing.session_id_var.reset(token)
+                    self.sessions.pop(session_id, None)
+                    self._read_stream_writers.pop(session_id, None)
+                    logger.info(
+                        "SSE session %s closed after %.0fs: %d messages in (%d bytes), %d bytes out",
+                        info.session_id, self._clock() - info.opened_at, info.messages_in, info.bytes_in,
+                        info.bytes_out,
+                    )
+                    await self.session_closed(session_id)
+
+    def _find_session(self, read_stream, candidates: set[UUID]) -> UUID:
+        """Pick the session whose writer feeds `read_stream` among those registered during connect."""
+        # Other sessions may register while the base class awaits request validation
+        if len(candidates) == 1:
+            return next(iter(candidates))
+        return next(
+            session_id for session_id in candidates
+            if self._read_stream_writers[session_id]._state is read_stream._state  # noqa: SLF001
+        )
+
+    def touch(self, session_id: UUID, size: int) -> None:
+        info = self.sessions.get(session_id)
+        if info is not None:
+            info.last_active = self._clock()
+            info.messages_in += 1
+            info.bytes_in += size
+
+    async def handle_post_message(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        body = await request.body()
+
+        async def replay() -> dict:
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        session_key = request.query_params.get("session_id", "")
+        try:
+            session_id = UUID(hex=session_key)
+        except ValueError:
+            pass
+        else:
+            session_key = session_id.hex
+            self.touch(session_id, len(body))
+        try:
+            message = json.loads(body)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            message = {}
+        with tracing.span(
+            "POST /messages/",
+            context=tracing.extract(request.headers),
+            **{"mcp.session_id": session_key, "mcp.method": message.get("method"), "mcp.request_id": message.get("id")},
+        ):
+            tracing.remember_message(session_key, message.get("id"))
+            await super().handle_post_message(scope, replay, send)
+
+    def reap(self) -> int:
+        """Close every session idle for longer than `idle_timeout`; returns how many were closed."""
+        cutoff = self._clock() - self.idle_timeout
+        idle = [info for info in self.sessions.values() if info.last_active < cutoff]
+        for info in idle:
+            logger.info("Closing SSE session %s of %s after %.0fs idle", info.session_id, info.client,
+                        self._clock() - info.last_active)
+            info.cancel_scope.cancel()
+        return len(idle)
+
+    async def reap_idle(self) -> None:
+        """Reap idle sessions periodically until cancelled."""
+        while True:
+            await asyncio.sleep(min(self.idle_timeout / 4, 30.0))
+            self.reap()
+
+
+class RoutedSseTransport(TrackedSseTransport):
+    """SSE transport whose sessions can be reached through any worker sharing its broker.
+
+    A POST for a session owned by this worker is handled as usual; one for a
+    session owned by another worker is validated here and forwarded, together
+    with the trace context of its POST span. Run `forward_messages` for the
+    lifetime of the app to receive forwarded messages.
+    """
+
+    # Seconds before re-subscribing after the broker subscription fails, doubling up to the maximum
+    resubscribe_delay = 1.0
+    max_resubscribe_delay = 30.0
+
+    def __init__(
+        self, endpoint: str, broker: SessionBroker, worker_id: str | None = None, **limits
+    ) -> None:
+        super().__init__(endpoint, **limits)
+        self.broker = broker
+        self.worker_id = worker_id or uuid4().hex
+        self._deliveries: set[asyncio.Task] = set()
+
+    async def session_opened(self, session_id: UUID) -> None:
+        await self.broker.claim(session_id.hex, self.worker_id)
+
+    async def session_closed(self, session_id: UUID) -> None:
+        await self.broker.release(session_id.hex)
+
+    async def handle_post_message(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        try:
+            session_id = UUID(hex=request.query_params.get("session_id", ""))
+        except ValueError:
+            session_id = None
+        # Local sessions, and malformed requests, get the base class's handling and error responses
+        if session_id is None or session_id in self._read_stream_writers:
+            return await super().handle_post_message(scope, receive, send)
+
+        owner = await self.broker.owner(session_id.hex)
+        if owner is None or owner == self.worker_id:
+            response = Response("Could not find session", status_code=404)
+            return await response(scope, receive, send)
+
+        try:
+            message = types.JSONRPCMessage.model_validate(await request.json())
+        except (ValueError, ValidationError) as err:
+            logger.error("Failed to parse message for session %s: %s", session_id.hex, err)
+            response = Response("Could not parse message", status_code=400)
+            return await response(scope, receive, send)
+
+        with tracing.span(
+            "POST /messages/",
+            context=tracing.extract(request.headers),
+            **{
+                "mcp.session_id": session_id.hex,
+                "mcp.method": getattr(message.root, "method", None),
+                "mcp.request_id": getattr(message.root, "id", None),
+                "mcp.forwarded_to": owner,
+            },
+        ):
+            envelope = {
+                "message": message.model_dump(mode="json", by_alias=True, exclude_none=True),
+                "trace": tracing.inject(),
+            }
+            await self.broker.publish(owner, session_id.hex, json.dumps(envelope))
+        response = Response("Accepted", status_code=202)
+        await response(scope, receive, send)
+
+    async def forward_messages(self) -> None:
+        """Deliver messages other workers forwarded to this worker's sessions, until cancelled.
+
+        Other workers keep routing this worker's sessions here, so if the
+        subscription fails (e.g. the Redis connection drops) it is logged and
+        re-established with exponential backoff rather than left dead.
+        """
+        delay = self.resubscribe_delay
+        while True:
+            try:
+                async for session_id, data in self.broker.subscribe(self.worker_id):
+                    delay = self.resubscribe_delay
+                    # Like concurrent POSTs, each delivery waits on its own session only
+                    task = asyncio.create_task(self._deliver(session_id, data))
+                    self._deliveries.add(task)
+                    task.add_done_callback(self._deliveries.discard)
+                logger.warning("Forwarded message subscription of worker %s ended", self.worker_id)
+            except Exception:
+                logger.exception("Forwarded message subscription of worker %s failed", self.worker_id)
+            logger.info("Re-subscribing worker %s to forwarded messages in %.1fs", self.worker_id, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_resubscribe_delay)
+
+    async def _deliver(self, session_id: str, data: str) -> None:
+        writer = self._read_stream_writers.get(UUID(hex=session_id))
+        if writer is None:
+            logger.warning("Dropping forwarded message for closed session %s", session_id)
+            return
+        self.touch(UUID(hex=session_id), len(data))
+        try:
+            envelope = json.loads(data)
+            message = types.JSONRPCMessage.model_validate(envelope["message"])
+        except (ValueError, KeyError, TypeError, ValidationError) as err:
+            logger.error("Dropping malformed forwarded message for session %s: %s", session_id, err)
+            return
+        request_id = getattr(message.root, "id", None)
+        with tracing.span(
+            "forwarded message",
+            context=tracing.extract(envelope.get("trace")),
+            **{"mcp.session_id": session_id, "mcp.request_id": request_id},
+        ):
+            tracing.remember_message(session_id, request_id)
+            try:
+                await writer.send(SessionMessage(message))
+            except Exception:
+                logger.exception("Delivering forwarded message to session %s failed", session_id)
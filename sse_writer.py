@@ -0,0 +1,125 @@
+"""Bounded, coalescing output buffer for long-lived SSE responses."""
+
+import asyncio
+import logging
+
+from starlette.types import Message, Send
+
+logger = logging.getLogger(__name__)
+
+
+# An SSE comment line, ignored by clients
+HEARTBEAT = b": heartbeat\r\n\r\n"
+
+
+class SlowClientError(Exception):
+    """Raised into a session whose client is not reading its SSE stream fast enough."""
+
+
+class CoalescingSend:
+    """Wraps an ASGI `send` so response writes are queued and flushed by a background task.
+
+    Body chunks that queue up while a flush is in progress (or within
+    `flush_delay` seconds of each other) are merged into a single write. At
+    most `max_buffer` bytes may wait for the client: past that, or if a single
+    write takes longer than `send_timeout`, the next call raises
+    SlowClientError, which tears the session down instead of buffering more.
+    If `heartbeat` is set, a comment is written whenever the stream has been
+    quiet that long, so writes to a dead peer fail and the session ends.
+    Use as an async context manager around the response.
+    """
+
+    def __init__(
+        self,
+        send: Send,
+        max_buffer: int = 1 << 20,
+        flush_delay: float = 0.005,
+        send_timeout: float = 30.0,
+        heartbeat: float = 0.0,
+    ) -> None:
+        self._send = send
+        self.max_buffer = max_buffer
+        self.flush_delay = flush_delay
+        self.send_timeout = send_timeout
+        self.heartbeat = heartbeat
+        self._pending: list[Message] = []
+        self.buffered = 0
+        self.sent = 0
+        self._streaming = False
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "CoalescingSend":
+        self._task = asyncio.create_task(self._writer())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._closing = True
+        self._wakeup.set()
+        if exc_info[0] is not None or self._error is not None:
+            self._task.cancel()
+        try:
+            await self._task
+        except SlowClientError:
+            pass
+        except asyncio.CancelledError:
+            # Expected if the writer was cancelled above or on overflow, but not if this task is being cancelled
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                raise
+
+    async def __call__(self, message: Message) -> None:
+        if self._error is not None:
+            raise self._error
+        if message["type"] == "http.response.start":
+            self._streaming = True
+        elif message["type"] == "http.response.body":
+            self._streaming = message.get("more_body", False)
+            body = message.get("body", b"")
+            if self.buffered + len(body) > self.max_buffer:
+                self._error = SlowClientError(f"more than {self.max_buffer} bytes waiting for the client")
+                self._task.cancel()
+                raise self._error
+            self.buffered += len(body)
+            last = self._pending[-1] if self._pending else None
+            if last is not None and last["type"] == "http.response.body" and last.get("more_body", False):
+                # Merge into the queued chunk; it keeps the new chunk's more_body flag
+                last["body"] += body
+                last["more_body"] = message.get("more_body", False)
+                self._wakeup.set()
+                return
+            message = {**message, "body": bytearray(body)}
+        self._pending.append(message)
+        self._wakeup.set()
+
+    async def _writer(self) -> None:
+        while True:
+            timeout = self.heartbeat if self.heartbeat and self._streaming else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                self._pending.append({"type": "http.response.body", "body": bytearray(HEARTBEAT), "more_body": True})
+                self.buffered += len(HEARTBEAT)
+            if self.flush_delay and not self._closing:
+                await asyncio.sleep(self.flush_delay)
+            self._wakeup.clear()
+            batch, self._pending = self._pending, []
+            for message in batch:
+                size = 0
+                if message["type"] == "http.response.body":
+                    size = len(message["body"])
+                    message["body"] = bytes(message["body"])
+                try:
+                    await asyncio.wait_for(self._send(message), self.send_timeout)
+                except TimeoutError:
+                    self._error = SlowClientError(f"a write took longer than {self.send_timeout}s")
+                    return
+                except Exception as e:
+                    self._error = e
+                    return
+                self.buffered -= size
+                self.sent += size
+            if self._closing and not self._pending:
+                return
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+import httpx
+import pytest
+from sse_starlette.sse import AppStatus
+
+import haxumcp
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def fresh_sse_exit_event():
+    # sse-starlette binds this global event to the first event loop that waits on it
+    AppStatus.should_exit_event = None
+
+
+class FakeClock:
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def mcp_server():
+    return haxumcp.mcp._mcp_server  # noqa: SLF001
+
+
+class StubUpstream:
+    """Answers every upstream request with `respond(request)` and records the requests it saw."""
+
+    def __init__(self) -> None:
+        self.requests: list[httpx.Request] = []
+        self.respond = lambda request: httpx.Response(200, json={"features": [], "Items": [], "NextPageLink": None})
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.respond(request)
+
+
+@pytest.fixture
+def stub_upstream(monkeypatch):
+    """Send upstream requests to a StubUpstream, with fresh clients and empty response caches."""
+    stub = StubUpstream()
+    monkeypatch.setattr(haxumcp.upstreams, "_transport", httpx.MockTransport(stub))
+    monkeypatch.setattr(haxumcp.upstreams, "_clients", {})
+    for cache in (haxumcp.nws_cache, haxumcp.azure_price_cache):
+        monkeypatch.setattr(cache, "_entries", OrderedDict())
+    return stub
@@ -0,0 +1,132 @@
+"""Drive the Starlette app in-process: its lifespan, streaming GET /sse, and plain requests."""
+
+import asyncio
+from contextlib import asynccontextmanager
+import json
+from typing import Any, AsyncIterator
+
+import httpx
+from starlette.applications import Starlette
+
+
+@asynccontextmanager
+async def running(app: Starlette) -> AsyncIterator[Starlette]:
+    """Run the app's lifespan (upstream pools, broker forwarding, ...) around the block."""
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+def client_for(app: Starlette) -> httpx.AsyncClient:
+    """A client whose requests are handled by `app` directly, without a socket."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+
+class SseConnection:
+    """An open GET /sse on an ASGI app, collecting the events it streams back.
+
+    httpx.ASGITransport buffers whole responses, so the request is driven by
+    calling the app directly; leaving the block disconnects the client.
+    """
+
+    def __init__(self, app: Starlette, path: str = "/sse") -> None:
+        self.app = app
+        self.path = path
+        self.status: int | None = None
+        self._events: asyncio.Queue[tuple[str | None, str]] = asyncio.Queue()
+        self._buffer = ""
+        self._disconnected = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "SseConnection":
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        self._task = asyncio.create_task(self.app(scope, self._receive, self._send))
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._disconnected.set()
+        await asyncio.wait_for(self._task, 5)
+
+    async def _receive(self) -> dict[str, Any]:
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message: dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            return
+        self._buffer += message.get("body", b"").decode()
+        self._buffer = self._buffer.replace("\r\n", "\n")
+        while "\n\n" in self._buffer:
+            block, self._buffer = self._buffer.split("\n\n", 1)
+            fields = {}
+            for line in block.split("\n"):
+                name, _, value = line.partition(":")
+                if name:
+                    fields[name] = value.removeprefix(" ")
+            if "data" in fields:
+                self._events.put_nowait((fields.get("event"), fields["data"]))
+
+    async def next_event(self, timeout: float = 5.0) -> tuple[str | None, str]:
+        """Wait for the next (event, data) pair."""
+        return await asyncio.wait_for(self._events.get(), timeout)
+
+    async def endpoint(self) -> str:
+        """The message URL the server announces first."""
+        event, data = await self.next_event()
+        assert event == "endpoint", (event, data)
+        return data
+
+    async def next_message(self, timeout: float = 5.0) -> dict[str, Any]:
+        """Wait for the next JSON-RPC message sent to the client."""
+        event, data = await self.next_event(timeout)
+        assert event == "message", (event, data)
+        return json.loads(data)
+
+
+def initialize_request(request_id: int = 1) -> dict[str, Any]:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "method": "initialize",
+        "params": {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "tests", "version": "1"}},
+    }
+
+
+async def initialize(client: httpx.AsyncClient, endpoint: str) -> None:
+    """Post the initialize handshake; the caller reads the reply from the SSE stream."""
+    response = await client.post(endpoint, json=initialize_request())
+    assert response.status_code == 202, response.text
+
+
+async def call_tool(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    stream: SseConnection,
+    name: str,
+    arguments: dict[str, Any],
+    headers: dict[str, str] | None = None,
+) -> dict[str, Any]:
+    """Complete the handshake on a fresh session, call one tool and return its reply."""
+    await initialize(client, endpoint)
+    assert (await stream.next_message())["id"] == 1
+    await client.post(endpoint, json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+    request = {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+    response = await client.post(endpoint, json=request, headers=headers)
+    assert response.status_code == 202, response.text
+    while True:
+        message = await stream.next_message()
+        if message.get("id") == 2:
+            return message
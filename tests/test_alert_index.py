@@ -0,0 +1,102 @@
+"""The in-memory active alerts index: snapshot diffs and lookups by state, zone and severity."""
+
+from alert_index import AlertDiff, AlertIndex
+
+
+def alert(alert_id: str, severity: str, *zones: str) -> dict:
+    return {
+        "id": alert_id,
+        "properties": {
+            "id": alert_id,
+            "severity": severity,
+            "geocode": {"UGC": list(zones)},
+            "affectedZones": [f"https://api.weather.gov/zones/forecast/{zone}" for zone in zones],
+        },
+    }
+
+
+def ids(features: list[dict]) -> list[str]:
+    return [feature["id"] for feature in features]
+
+
+def buckets(index: AlertIndex) -> dict[str, set[str]]:
+    """Every value each secondary index holds a bucket for."""
+    return {
+        "state": set(index._by_state),  # noqa: SLF001
+        "zone": set(index._by_zone),  # noqa: SLF001
+        "severity": set(index._by_severity),  # noqa: SLF001
+    }
+
+
+def test_replace_reports_added_updated_and_removed_alerts():
+    index = AlertIndex()
+    first = index.replace([alert("a", "Minor", "CAZ001"), alert("b", "Severe", "NVZ001")])
+    assert first == AlertDiff(added=["a", "b"])
+
+    second = index.replace(
+        [alert("b", "Extreme", "NVZ001"), alert("c", "Minor", "ORZ001"), alert("a", "Minor", "CAZ001")]
+    )
+    assert second == AlertDiff(added=["c"], updated=["b"])
+
+    third = index.replace([alert("c", "Minor", "ORZ001")])
+    assert (third.added, third.updated, sorted(third.removed)) == ([], [], ["a", "b"])
+    assert len(index) == 1
+
+
+def test_unchanged_snapshot_is_an_empty_diff():
+    index = AlertIndex()
+    features = [alert("a", "Minor", "CAZ001")]
+    index.replace(features)
+
+    diff = index.replace([alert("a", "Minor", "CAZ001")])
+
+    assert not diff
+    assert len(index) == 1
+
+
+def test_lookups_follow_feed_order():
+    index = AlertIndex()
+    index.replace(
+        [alert("b", "Minor", "CAZ002"), alert("a", "Severe", "CAZ001", "NVZ001"), alert("c", "Minor", "CAZ001")]
+    )
+
+    assert ids(index.by_states(["CA"])) == ["b", "a", "c"]
+    assert ids(index.by_states(["NV", "OR"])) == ["a"]
+    assert ids(index.by_zone("CAZ001")) == ["a", "c"]
+    assert ids(index.by_severity("Minor")) == ["b", "c"]
+    assert index.by_zone("ORZ001") == []
+
+
+def test_updated_alert_is_moved_between_buckets():
+    index = AlertIndex()
+    index.replace([alert("a", "Moderate", "CAZ001")])
+
+    index.replace([alert("a", "Extreme", "NVZ003")])
+
+    assert index.by_states(["CA"]) == []
+    assert index.by_zone("CAZ001") == []
+    assert index.by_severity("Moderate") == []
+    assert ids(index.by_states(["NV"])) == ids(index.by_zone("NVZ003")) == ids(index.by_severity("Extreme")) == ["a"]
+    assert buckets(index) == {"state": {"NV"}, "zone": {"NVZ003"}, "severity": {"Extreme"}}
+
+
+def test_removed_alerts_leave_no_empty_buckets():
+    index = AlertIndex()
+    index.replace([alert("a", "Minor", "CAZ001", "NVZ001"), alert("b", "Minor", "CAZ002")])
+
+    index.replace([alert("b", "Minor", "CAZ002")])
+    assert buckets(index) == {"state": {"CA"}, "zone": {"CAZ002"}, "severity": {"Minor"}}
+
+    index.replace([])
+    assert len(index) == 0
+    assert buckets(index) == {"state": set(), "zone": set(), "severity": set()}
+
+
+def test_alert_without_severity_is_indexed_as_unknown():
+    index = AlertIndex()
+    feature = alert("a", "Minor", "CAZ001")
+    del feature["properties"]["severity"]
+
+    index.replace([feature])
+
+    assert ids(index.by_severity("Unknown")) == ["a"]
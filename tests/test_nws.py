@@ -0,0 +1,122 @@
+"""NWS lookups: conditional revalidation of cached responses, and grouping alerts for several states."""
+
+import httpx
+import pytest
+
+import haxumcp
+from upstream import FRESH
+
+pytestmark = pytest.mark.anyio
+
+ALERTS_URL = f"{haxumcp.NWS_API_BASE}/alerts/active/area/CA"
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+@pytest.fixture
+def nws_clock(clock, monkeypatch):
+    monkeypatch.setattr(haxumcp.nws_cache, "_clock", clock)
+    return clock
+
+
+@pytest.fixture
+def expired_alerts(nws_clock):
+    """A cached alerts response that has just run out of lifetime but can be revalidated."""
+    body = {"features": [{"id": "cached"}]}
+    response_headers = httpx.Headers(
+        {"Cache-Control": "max-age=60, stale-while-revalidate=0", "ETag": '"v1"', "Last-Modified": LAST_MODIFIED}
+    )
+    haxumcp.nws_cache.store(ALERTS_URL, body, response_headers)
+    nws_clock.advance(60)
+    return body
+
+
+async def test_expired_entry_is_revalidated_and_kept_on_304(stub_upstream, expired_alerts, nws_clock):
+    stub_upstream.respond = lambda request: httpx.Response(304, headers={"Cache-Control": "max-age=120"})
+
+    assert await haxumcp.make_nws_request(ALERTS_URL) == expired_alerts
+
+    [request] = stub_upstream.requests
+    assert request.headers["If-None-Match"] == '"v1"'
+    assert request.headers["If-Modified-Since"] == LAST_MODIFIED
+    entry, status = haxumcp.nws_cache.lookup(ALERTS_URL)
+    assert status == FRESH
+    assert entry.body == expired_alerts
+    assert entry.fresh_until == nws_clock() + 120
+    # The 304 sent no validators, so the stored ones still apply
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"', "If-Modified-Since": LAST_MODIFIED}
+
+
+async def test_renewed_entry_is_served_without_a_request(stub_upstream, expired_alerts, nws_clock):
+    stub_upstream.respond = lambda request: httpx.Response(304, headers={"Cache-Control": "max-age=120"})
+    await haxumcp.make_nws_request(ALERTS_URL)
+
+    nws_clock.advance(119)
+    assert await haxumcp.make_nws_request(ALERTS_URL) == expired_alerts
+    assert len(stub_upstream.requests) == 1
+
+
+async def test_changed_response_replaces_the_cached_body(stub_upstream, expired_alerts):
+    changed = {"features": [{"id": "new"}]}
+    stub_upstream.respond = lambda request: httpx.Response(
+        200, json=changed, headers={"Cache-Control": "max-age=60", "ETag": '"v2"'}
+    )
+
+    assert await haxumcp.make_nws_request(ALERTS_URL) == changed
+    entry, status = haxumcp.nws_cache.lookup(ALERTS_URL)
+    assert (entry.body, entry.etag, status) == (changed, '"v2"', FRESH)
+
+
+def alert(alert_id: str, event: str, *zones: str) -> dict:
+    return {
+        "id": alert_id,
+        "properties": {"id": alert_id, "event": event, "severity": "Moderate", "geocode": {"UGC": list(zones)}},
+    }
+
+
+def sections(text: str) -> dict[str, str]:
+    """Split get_alerts output into {heading: body}."""
+    parts = text.split("== ")[1:]
+    return dict(part.split(" ==\n", 1) for part in parts)
+
+
+@pytest.fixture
+def alerts_feed(stub_upstream):
+    """Serve the given alert features for any alerts request."""
+
+    def serve(*features: dict) -> None:
+        stub_upstream.respond = lambda request: httpx.Response(200, json={"features": list(features)})
+
+    return serve
+
+
+async def test_alert_spanning_requested_states_is_listed_once_under_a_combined_heading(stub_upstream, alerts_feed):
+    spanning = alert("a1", "Red Flag Warning", "CAZ072", "NVZ001", "NVZ002")
+    alerts_feed(spanning, alert("a2", "Flood Watch", "CAZ073"), spanning)
+
+    result = sections(await haxumcp.get_alerts(["ca", "NV", "CA"]))
+
+    assert list(result) == ["Alerts for CA", "Alerts covering CA, NV"]
+    assert result["Alerts covering CA, NV"].count("Event: Red Flag Warning") == 1
+    assert "Flood Watch" in result["Alerts for CA"]
+    [request] = stub_upstream.requests
+    assert request.url.params["area"] == "CA,NV"
+
+
+async def test_requested_state_without_alerts_says_so(alerts_feed):
+    alerts_feed(alert("a1", "Flood Watch", "CAZ073"))
+
+    result = sections(await haxumcp.get_alerts(["CA", "OR"]))
+
+    assert list(result) == ["Alerts for CA", "Alerts for OR"]
+    assert result["Alerts for OR"].strip() == "No active alerts for this state."
+
+
+async def test_alerts_outside_the_requested_states_go_under_other(alerts_feed):
+    # None of the second alert's UGC codes belong to a requested state
+    alerts_feed(alert("a1", "Flood Watch", "CAZ073"), alert("a2", "Gale Warning", "PZZ350", "WAZ001"))
+
+    result = sections(await haxumcp.get_alerts(["CA", "NV"]))
+
+    assert list(result) == ["Alerts for CA", "Alerts for NV", "Other alerts"]
+    assert "Gale Warning" in result["Other alerts"]
+    assert "No active alerts" in result["Alerts for NV"]
@@ -0,0 +1,160 @@
+"""Parsing OData price filters, and evaluating them against the local mirror the way the API does."""
+
+from pathlib import Path
+
+import pytest
+
+from odata_filter import BoolOp, Call, Comparison, FilterSyntaxError, Not, UnsupportedFilterError, parse_filter
+from price_mirror import PriceMirror, load_fixture
+
+CATALOG = load_fixture(str(Path(__file__).parent / "data" / "azure_prices.json"))
+
+
+def test_and_binds_tighter_than_or():
+    assert parse_filter("a eq 1 or b eq 2 and c eq 3") == BoolOp(
+        "or", (Comparison("a", "eq", 1), BoolOp("and", (Comparison("b", "eq", 2), Comparison("c", "eq", 3))))
+    )
+
+
+def test_parentheses_override_precedence():
+    assert parse_filter("(a eq 1 or b eq 2) and c eq 3") == BoolOp(
+        "and", (BoolOp("or", (Comparison("a", "eq", 1), Comparison("b", "eq", 2))), Comparison("c", "eq", 3))
+    )
+
+
+def test_not_applies_to_the_next_operand_only():
+    assert parse_filter("not a eq 1 and b eq 2") == BoolOp(
+        "and", (Not(Comparison("a", "eq", 1)), Comparison("b", "eq", 2))
+    )
+    assert parse_filter("not (a eq 1 and b eq 2)") == Not(
+        BoolOp("and", (Comparison("a", "eq", 1), Comparison("b", "eq", 2)))
+    )
+
+
+def test_keywords_are_case_insensitive():
+    assert parse_filter("a EQ 1 AND NOT b Eq true") == BoolOp(
+        "and", (Comparison("a", "eq", 1), Not(Comparison("b", "eq", True)))
+    )
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [
+        ("a eq 'it''s'", "it's"),
+        ("a eq ''''", "'"),
+        ("a eq ''", ""),
+        ("a eq -3", -3),
+        ("a eq 0.25", 0.25),
+        ("a eq 1e3", 1000.0),
+        ("a eq null", None),
+        ("a eq false", False),
+        ("a ge 2024-01-01", "2024-01-01"),
+        ("a ge 2024-01-01T00:00:00+05:00", "2024-01-01T00:00:00+05:00"),
+    ],
+)
+def test_literals(text, value):
+    node = parse_filter(text)
+    assert node == Comparison("a", node.op, value)
+    assert type(node.value) is type(value)
+
+
+def test_functions():
+    assert parse_filter("contains(armSkuName, 'D2') or STARTSWITH(a, 'x''y')") == BoolOp(
+        "or", (Call("contains", "armSkuName", "D2"), Call("startswith", "a", "x'y"))
+    )
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ("", "Empty filter expression at position 0"),
+        ("serviceName eq 'Storage", "Unterminated string literal at position 15"),
+        ("armSkuName eq Standard-D2", "Expected a literal value, found 'Standard' at position 14"),
+        ("armSkuName eq 'a'-1", "Unexpected '-1' at position 17"),
+        ("a eq 1 *", "Unexpected '*' at position 7"),
+        ("a eq @p", "Expected a literal value, found '@' at position 5"),
+        ("(a eq 1", "Expected ), found 'end of filter' at position 7"),
+        ("a eq 1 and", "Expected field name or function, found 'end of filter' at position 10"),
+        ("a 'x'", "Expected comparison operator after 'a', found \"'x'\" at position 2"),
+        ("contains(a, 1)", "contains() expects a string literal at position 12"),
+        ("a eq 1 b eq 2", "Unexpected 'b' at position 7"),
+    ],
+)
+def test_malformed_filters_are_syntax_errors(text, message):
+    with pytest.raises(FilterSyntaxError) as raised:
+        parse_filter(text)
+    assert type(raised.value) is FilterSyntaxError
+    assert str(raised.value) == message
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "tolower(serviceName) eq 'storage'",
+        "contains(tolower(armSkuName), 'd2')",
+        "armRegionName in ('eastus', 'westus')",
+        "retailPrice add 1 gt 2",
+        "properties/tier eq 'Hot'",
+        "contains(properties/tier, 'Hot')",
+        "-retailPrice lt -1",
+        "$it eq 1",
+        "Namespace.fn(armSkuName) eq 1",
+        "tags/any(t: t eq 'x')",
+    ],
+)
+def test_valid_odata_outside_the_subset_is_unsupported(text):
+    with pytest.raises(UnsupportedFilterError):
+        parse_filter(text)
+
+
+@pytest.fixture(scope="module")
+def mirror():
+    mirror = PriceMirror(":memory:")
+    mirror.begin_refresh()
+    mirror.add_items(CATALOG)
+    mirror.commit_refresh()
+    yield mirror
+    mirror.close()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("serviceName eq 'Storage'", lambda item: item["serviceName"] == "Storage"),
+        ("serviceName ne 'Storage'", lambda item: item["serviceName"] != "Storage"),
+        ("retailPrice gt 0.4", lambda item: item["retailPrice"] > 0.4),
+        ("retailPrice le 0.384", lambda item: item["retailPrice"] <= 0.384),
+        ("retailPrice eq 1234", lambda item: item["retailPrice"] == 1234),
+        ("effectiveStartDate ge 2024-01-01", lambda item: item["effectiveStartDate"] >= "2024-01-01"),
+        ("armSkuName eq ''", lambda item: item["armSkuName"] == ""),
+        ("contains(armSkuName, 'D4')", lambda item: "D4" in item["armSkuName"]),
+        ("startswith(armSkuName, 'Standard_')", lambda item: item["armSkuName"].startswith("Standard_")),
+        ("endswith(armSkuName, '_v3')", lambda item: item["armSkuName"].endswith("_v3")),
+        ("isPrimaryMeterRegion eq false", lambda item: item["isPrimaryMeterRegion"] is False),
+        ("isPrimaryMeterRegion ne true", lambda item: item["isPrimaryMeterRegion"] is not True),
+        ("reservationTerm eq '1 Year'", lambda item: item.get("reservationTerm") == "1 Year"),
+        ("reservationTerm eq null", lambda item: item.get("reservationTerm") is None),
+        ("reservationTerm ne null", lambda item: item.get("reservationTerm") is not None),
+        ("not (reservationTerm eq '1 Year')", lambda item: item.get("reservationTerm") != "1 Year"),
+        (
+            "armRegionName eq 'eastus' and (contains(skuName, 'D2') or serviceName eq 'Storage')",
+            lambda item: item["armRegionName"] == "eastus"
+            and ("D2" in item["skuName"] or item["serviceName"] == "Storage"),
+        ),
+        (
+            "not (serviceName eq 'Virtual Machines' or retailPrice lt 0.1)",
+            lambda item: item["serviceName"] == "SQL Database",
+        ),
+        # A field compared with a literal of another type matches nothing, as in the API
+        ("armSkuName gt 5", lambda item: False),
+        ("not (armSkuName gt 5)", lambda item: True),
+        ("contains(retailPrice, '0.1')", lambda item: False),
+        ("retailPrice eq '0.192'", lambda item: False),
+        ("retailPrice eq true", lambda item: False),
+        ("isPrimaryMeterRegion eq 1", lambda item: False),
+        ("retailPrice gt null", lambda item: False),
+        ("isPrimaryMeterRegion gt false", lambda item: False),
+    ],
+)
+def test_mirror_matches_the_same_items_as_the_filter(mirror, text, expected):
+    assert mirror.query(parse_filter(text)) == [item for item in CATALOG if expected(item)]
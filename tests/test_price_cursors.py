@@ -0,0 +1,110 @@
+"""get_azure_price cursors carry their own resume state, so any replica can continue them."""
+
+import re
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+
+import haxumcp
+from haxumcp import PriceContinuation, decode_cursor, encode_cursor
+from odata_filter import parse_filter
+
+pytestmark = pytest.mark.anyio
+
+NEXT_PAGE = f"{haxumcp.AZURE_PRICE_API_BASE}?api-version={haxumcp.AZURE_PRICE_API_VERSION}&$skip=100"
+
+
+def cursor_of(text: str) -> str | None:
+    match = re.search(r'cursor "([^"]+)"', text)
+    return match.group(1) if match else None
+
+
+def page(skus, next_page_link=None) -> httpx.Response:
+    items = [{"productName": "Virtual Machines", "skuName": sku, "retailPrice": 0.1} for sku in skus]
+    return httpx.Response(200, json={"Items": items, "NextPageLink": next_page_link})
+
+
+@pytest.fixture
+def paged_api(stub_upstream, monkeypatch):
+    """A two-page price API answering one page per call."""
+    monkeypatch.setattr(haxumcp, "AZURE_PRICE_MAX_PAGES", 1)
+    stub_upstream.respond = lambda request: (
+        page(["D4 v3"]) if "$skip" in request.url.params else page(["D2 v3"], NEXT_PAGE)
+    )
+    return stub_upstream
+
+
+async def test_api_cursor_resumes_from_its_next_page_link(paged_api):
+    first = await haxumcp.get_azure_price("serviceName eq 'Virtual Machines'")
+    second = await haxumcp.get_azure_price_next(cursor_of(first))
+
+    assert "SKU: D2 v3" in first
+    assert "SKU: D4 v3" in second
+    assert paged_api.requests[-1].url.params["$skip"] == "100"
+    assert decode_cursor(cursor_of(first)) == PriceContinuation(next_page_url=NEXT_PAGE)
+
+
+def test_cursor_accepts_next_page_links_with_an_explicit_port():
+    url = "https://prices.azure.com:443/api/retail/prices?currencyCode='USD'&$skip=100"
+
+    assert decode_cursor(encode_cursor(PriceContinuation(next_page_url=url))) == PriceContinuation(next_page_url=url)
+
+
+def test_mirror_cursor_round_trips():
+    continuation = PriceContinuation(
+        where=parse_filter("serviceName eq 'Storage'"), offset=1000, filter_expression="serviceName eq 'Storage'"
+    )
+
+    assert decode_cursor(encode_cursor(continuation)) == continuation
+
+
+async def test_mirror_cursor_continues_through_the_api_without_a_mirror(stub_upstream, monkeypatch):
+    monkeypatch.setattr(haxumcp, "price_mirror", None)
+    cursor = encode_cursor(PriceContinuation(offset=1000, filter_expression="serviceName eq 'Storage'"))
+
+    await haxumcp.get_azure_price_next(cursor)
+
+    query = parse_qs(urlsplit(str(stub_upstream.requests[0].url)).query)
+    assert query["$filter"] == ["serviceName eq 'Storage'"]
+    assert query["$skip"] == ["1000"]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        encode_cursor(PriceContinuation(next_page_url="https://attacker.example/?api-version=1")),
+        encode_cursor(PriceContinuation(next_page_url="https://prices.azure.com.attacker.example/api/retail/prices")),
+        encode_cursor(PriceContinuation(next_page_url="http://prices.azure.com/api/retail/prices?x=1")),
+        encode_cursor(PriceContinuation(next_page_url="https://prices.azure.com:8443/api/retail/prices?x=1")),
+        encode_cursor(PriceContinuation(offset=0, filter_expression="serviceName eq")),
+    ],
+)
+async def test_bad_cursors_are_refused(stub_upstream, cursor):
+    result = await haxumcp.get_azure_price_next(cursor)
+
+    assert result.startswith("Unknown or expired cursor")
+    assert not stub_upstream.requests
+
+
+def test_cursor_expires(monkeypatch):
+    cursor = encode_cursor(PriceContinuation(next_page_url=NEXT_PAGE))
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + haxumcp.AZURE_PRICE_CURSOR_TTL + 1)
+
+    assert decode_cursor(cursor) is None
+
+
+def test_signed_cursor_rejects_tampering(monkeypatch):
+    monkeypatch.setattr(haxumcp, "AZURE_PRICE_CURSOR_SECRET", "shared-secret")
+    cursor = encode_cursor(PriceContinuation(next_page_url=NEXT_PAGE))
+    payload, _, signature = cursor.partition(".")
+    forged = encode_cursor(PriceContinuation(next_page_url=NEXT_PAGE.replace("100", "200"))).partition(".")[0]
+
+    assert decode_cursor(cursor) == PriceContinuation(next_page_url=NEXT_PAGE)
+    assert decode_cursor(payload) is None
+    assert decode_cursor(f"{forged}.{signature}") is None
+    monkeypatch.setattr(haxumcp, "AZURE_PRICE_CURSOR_SECRET", "other-secret")
+    assert decode_cursor(cursor) is None
@@ -0,0 +1,116 @@
+"""The local price mirror: loading a saved catalog, answering get_azure_price, and surviving failed refreshes."""
+
+from pathlib import Path
+import re
+import sqlite3
+
+import pytest
+
+import haxumcp
+from price_mirror import PriceMirror, load_fixture
+
+pytestmark = pytest.mark.anyio
+
+CATALOG = Path(__file__).parent / "data" / "azure_prices.json"
+
+
+@pytest.fixture
+async def mirror(tmp_path, monkeypatch, stub_upstream):
+    """A mirror loaded from the fixture catalog through price_catalog_pages, as the server would."""
+    monkeypatch.setattr(haxumcp, "AZURE_PRICE_MIRROR_SOURCE", str(CATALOG))
+    mirror = PriceMirror(str(tmp_path / "prices.db"))
+    monkeypatch.setattr(haxumcp, "price_mirror", mirror)
+    assert await mirror.refresh(haxumcp.price_catalog_pages()) == len(load_fixture(str(CATALOG)))
+    yield mirror
+    mirror.close()
+
+
+def skus(text: str) -> list[str]:
+    return re.findall(r"^SKU: (.*)$", text, re.MULTILINE)
+
+
+def cursor_of(text: str) -> str | None:
+    match = re.search(r'cursor "([^"]+)"', text)
+    return match.group(1) if match else None
+
+
+async def failing_pages():
+    yield [{"serviceName": "Partial", "armRegionName": "nowhere"}]
+    raise RuntimeError("catalog download interrupted")
+
+
+async def test_query_is_answered_from_the_mirror(mirror, stub_upstream):
+    result = await haxumcp.get_azure_price("serviceName eq 'Virtual Machines' and armRegionName eq 'westeurope'")
+
+    assert result.startswith("Found 3 pricing items (showing all)")
+    assert skus(result) == ["D2 v3", "D4 v3", "D8 v3"]
+    assert not stub_upstream.requests
+
+
+async def test_mirror_understands_dates_and_functions(mirror, stub_upstream):
+    result = await haxumcp.get_azure_price("effectiveStartDate ge 2024-01-01 and endswith(armSkuName, '8_v3')")
+
+    assert skus(result) == ["D8 v3", "D8 v3"]
+    assert not stub_upstream.requests
+
+
+async def test_cursor_resumes_at_mirror_offset(mirror, monkeypatch):
+    monkeypatch.setattr(haxumcp, "AZURE_PRICE_MIRROR_MAX_ITEMS", 4)
+
+    first = await haxumcp.get_azure_price("serviceName eq 'Virtual Machines'")
+    second = await haxumcp.get_azure_price_next(cursor_of(first))
+
+    assert skus(first) == ["D2 v3", "D4 v3", "D8 v3", "D2 v3"]
+    assert skus(second) == ["D4 v3", "D8 v3"]
+    assert cursor_of(second) is None
+
+
+async def test_unsupported_filter_goes_to_the_api(mirror, stub_upstream):
+    result = await haxumcp.get_azure_price("tolower(serviceName) eq 'storage'")
+
+    assert "no results found" in result
+    assert [request.url.params["$filter"] for request in stub_upstream.requests] == ["tolower(serviceName) eq 'storage'"]
+
+
+async def test_malformed_filter_is_rejected(mirror, stub_upstream):
+    result = await haxumcp.get_azure_price("serviceName eq 'Storage")
+
+    assert result.startswith("Invalid filter expression: Unterminated string literal")
+    assert not stub_upstream.requests
+
+
+async def test_failed_refresh_keeps_the_current_catalog(mirror):
+    refreshed_at = mirror.refreshed_at
+
+    with pytest.raises(RuntimeError):
+        await mirror.refresh(failing_pages())
+
+    assert mirror.refreshed_at == refreshed_at
+    assert len(mirror) == len(load_fixture(str(CATALOG)))
+    assert skus(await haxumcp.get_azure_price("serviceName eq 'Storage'")) == ["Hot LRS"]
+
+
+async def test_refresh_after_a_rejected_page_succeeds(mirror):
+    async def bad_pages():
+        # A list is not a valid SQLite value, so inserting this page fails
+        yield [{"serviceName": ["Virtual Machines"]}]
+
+    with pytest.raises(sqlite3.Error):
+        await mirror.refresh(bad_pages())
+    assert await mirror.refresh(haxumcp.price_catalog_pages()) == len(load_fixture(str(CATALOG)))
+
+
+async def test_second_process_skips_refresh_while_first_holds_the_lock(mirror, tmp_path):
+    other = PriceMirror(mirror.path)
+    try:
+        started = []
+
+        async def pages():
+            started.append(await other.refresh(haxumcp.price_catalog_pages()))
+            yield load_fixture(str(CATALOG))
+
+        assert await mirror.refresh(pages()) == len(load_fixture(str(CATALOG)))
+        assert started == [None]
+        assert other.sync() == mirror.refreshed_at
+    finally:
+        other.close()
@@ -0,0 +1,148 @@
+"""HTTP caching rules for upstream responses: how long a response stays fresh, then stale, then only revalidatable."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from upstream import EXPIRED, FRESH, STALE, ResponseCache, freshness
+
+
+def headers(**values: str) -> httpx.Headers:
+    return httpx.Headers({name.replace("_", "-"): value for name, value in values.items()})
+
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment, usegmt=True)
+
+
+@pytest.mark.parametrize(
+    "response_headers, expected",
+    [
+        (headers(Cache_Control="max-age=60, s-maxage=120"), (120.0, 5.0)),
+        (headers(Cache_Control="s-maxage=0, max-age=60"), (0.0, 5.0)),
+        (headers(Cache_Control="max-age=60", Expires="Thu, 01 Jan 2099 00:00:00 GMT"), (60.0, 5.0)),
+        (headers(Cache_Control="max-age=60", Age="20"), (40.0, 5.0)),
+        (headers(Cache_Control="max-age=60", Age="90"), (0.0, 5.0)),
+        (headers(Cache_Control="max-age=60, stale-while-revalidate=30"), (60.0, 30.0)),
+        (headers(Cache_Control="max-age=60, must-revalidate"), (60.0, 0.0)),
+        (headers(Cache_Control="max-age=60, proxy-revalidate, stale-while-revalidate=30"), (60.0, 0.0)),
+        (headers(Cache_Control="no-cache, max-age=60, stale-while-revalidate=30"), (0.0, 0.0)),
+        (headers(Cache_Control="max-age=bogus"), (0.0, 0.0)),
+        (headers(Expires="not a date"), (0.0, 5.0)),
+        (headers(), (0.0, 0.0)),
+    ],
+)
+def test_freshness(response_headers, expected):
+    assert freshness(response_headers, default_swr=5.0) == expected
+
+
+def test_expires_is_relative_to_the_date_header():
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    response_headers = headers(Date=http_date(date), Expires=http_date(date + timedelta(minutes=5)))
+
+    assert freshness(response_headers) == (300.0, 0.0)
+
+
+def test_expires_in_the_past_is_already_stale():
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    response_headers = headers(Date=http_date(date), Expires=http_date(date - timedelta(minutes=5)))
+
+    assert freshness(response_headers) == (0.0, 0.0)
+
+
+def test_default_ttl_applies_only_without_caching_headers():
+    assert freshness(headers(), default_ttl=3600.0) == (3600.0, 0.0)
+    assert freshness(headers(Cache_Control="max-age=60"), default_ttl=3600.0) == (60.0, 0.0)
+
+
+@pytest.mark.parametrize("cache_control", ["no-store", "private", "private, max-age=60", "no-store, max-age=60"])
+def test_uncacheable_responses(cache_control):
+    assert freshness(headers(Cache_Control=cache_control)) is None
+
+
+def test_entry_goes_fresh_then_stale_then_expired(clock):
+    cache = ResponseCache(maxsize=10, clock=clock)
+    cache.store("key", {"v": 1}, headers(Cache_Control="max-age=60, stale-while-revalidate=30", ETag='"v1"'))
+
+    assert cache.lookup("key")[1] == FRESH
+    clock.advance(60)
+    assert cache.lookup("key")[1] == STALE
+    clock.advance(30)
+    entry, status = cache.lookup("key")
+    # Past the stale window the body is kept only to revalidate with its ETag
+    assert status == EXPIRED
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+
+
+def test_entry_without_validators_is_dropped_once_stale_window_ends(clock):
+    cache = ResponseCache(maxsize=10, clock=clock)
+    cache.store("key", {"v": 1}, headers(Cache_Control="max-age=60, stale-while-revalidate=30"))
+
+    clock.advance(89.9)
+    assert cache.lookup("key")[1] == STALE
+    clock.advance(0.1)
+    assert cache.lookup("key") == (None, None)
+    assert len(cache) == 0
+
+
+def test_no_cache_response_is_only_kept_for_revalidation(clock):
+    cache = ResponseCache(maxsize=10, default_swr=60.0, clock=clock)
+    cache.store("key", {"v": 1}, headers(Cache_Control="no-cache", Last_Modified="Mon, 01 Jan 2024 00:00:00 GMT"))
+
+    entry, status = cache.lookup("key")
+    assert status == EXPIRED
+    assert entry.conditional_headers() == {"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+
+def test_response_without_lifetime_or_validators_is_not_stored(clock):
+    cache = ResponseCache(maxsize=10, default_swr=60.0, clock=clock)
+
+    assert cache.store("key", {"v": 1}, headers()) is None
+    assert len(cache) == 0
+
+
+def test_no_store_response_replaces_a_cached_one(clock):
+    cache = ResponseCache(maxsize=10, clock=clock)
+    cache.store("key", {"v": 1}, headers(Cache_Control="max-age=60"))
+
+    cache.store("key", {"v": 2}, headers(Cache_Control="no-store"))
+
+    assert cache.lookup("key") == (None, None)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(maxsize=2, clock=clock)
+    for key in ("a", "b"):
+        cache.store(key, key, headers(Cache_Control="max-age=60"))
+    cache.lookup("a")
+
+    cache.store("c", "c", headers(Cache_Control="max-age=60"))
+
+    assert cache.peek("a") is not None
+    assert cache.peek("b") is None
+
+
+@pytest.mark.anyio
+async def test_stale_entry_is_revalidated_by_one_background_task(clock):
+    cache = ResponseCache(maxsize=10, clock=clock)
+    release = asyncio.Event()
+    refreshes = []
+
+    async def refresh():
+        refreshes.append(len(refreshes))
+        await release.wait()
+
+    for _ in range(3):
+        cache.revalidate("key", refresh)
+    await asyncio.sleep(0)
+    assert refreshes == [0]
+
+    release.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    cache.revalidate("key", refresh)
+    await asyncio.sleep(0)
+    assert refreshes == [0, 1]
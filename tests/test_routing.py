@@ -0,0 +1,92 @@
+"""Messages posted to a worker that does not own the SSE session reach it through the broker."""
+
+import logging
+from uuid import uuid4
+
+import pytest
+
+from haxumcp import create_starlette_app
+from sessions import LocalBroker, RoutedSseTransport
+from sse_harness import SseConnection, client_for, initialize, running
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyBroker(LocalBroker):
+    """A LocalBroker whose first subscription of each worker drops, like a lost Redis connection."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.failed: set[str] = set()
+
+    async def subscribe(self, worker_id):
+        if worker_id not in self.failed:
+            self.failed.add(worker_id)
+            raise ConnectionError("connection lost")
+        async for item in super().subscribe(worker_id):
+            yield item
+
+
+@pytest.fixture
+def workers(mcp_server, stub_upstream):
+    """Two apps sharing a LocalBroker, as two uvicorn workers would share Redis."""
+    broker = LocalBroker()
+    return [create_starlette_app(mcp_server, broker=broker, streamable_http=False) for _ in range(2)]
+
+
+async def test_post_to_other_worker_reaches_owning_session(workers):
+    owner, other = workers
+    async with running(owner), running(other), SseConnection(owner) as stream, client_for(other) as client:
+        endpoint = await stream.endpoint()
+
+        await initialize(client, endpoint)
+        reply = await stream.next_message()
+
+    assert reply["id"] == 1
+    assert reply["result"]["serverInfo"]["name"] == "weather"
+
+
+async def test_forwarding_resubscribes_after_the_subscription_fails(mcp_server, stub_upstream, monkeypatch, caplog):
+    monkeypatch.setattr(RoutedSseTransport, "resubscribe_delay", 0.01)
+    broker = FlakyBroker()
+    owner, other = [create_starlette_app(mcp_server, broker=broker, streamable_http=False) for _ in range(2)]
+    async with running(owner), running(other), SseConnection(owner) as stream, client_for(other) as client:
+        endpoint = await stream.endpoint()
+
+        await initialize(client, endpoint)
+        reply = await stream.next_message()
+
+    assert reply["id"] == 1
+    assert len(broker.failed) == 2
+    assert any(
+        record.levelno == logging.ERROR and "subscription" in record.getMessage() for record in caplog.records
+    )
+
+
+async def test_post_to_owning_worker_is_handled_locally(workers):
+    owner, _ = workers
+    async with running(owner), SseConnection(owner) as stream, client_for(owner) as client:
+        endpoint = await stream.endpoint()
+
+        await initialize(client, endpoint)
+        reply = await stream.next_message()
+
+    assert reply["id"] == 1
+
+
+@pytest.mark.parametrize("worker", [0, 1])
+async def test_unknown_session_is_not_found(workers, worker):
+    async with running(workers[0]), running(workers[1]), client_for(workers[worker]) as client:
+        response = await client.post(f"/messages/?session_id={uuid4().hex}", json={"jsonrpc": "2.0", "method": "ping"})
+
+    assert response.status_code == 404
+
+
+async def test_malformed_message_for_remote_session_is_rejected(workers):
+    owner, other = workers
+    async with running(owner), running(other), SseConnection(owner) as stream, client_for(other) as client:
+        endpoint = await stream.endpoint()
+
+        response = await client.post(endpoint, json={"not": "json-rpc"})
+
+    assert response.status_code == 400
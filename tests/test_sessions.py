@@ -0,0 +1,84 @@
+"""SSE session bookkeeping: the session limit and closing sessions that have gone idle."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+import haxumcp
+from haxumcp import create_starlette_app
+from sessions import SessionInfo, TrackedSseTransport
+from sse_harness import SseConnection, client_for, initialize, running
+
+pytestmark = pytest.mark.anyio
+
+
+def open_session(transport: TrackedSseTransport, opened_at: float) -> SessionInfo:
+    info = SessionInfo(uuid4().hex, "127.0.0.1:50000", opened_at, opened_at)
+    transport.sessions[uuid4()] = info
+    return info
+
+
+async def test_reap_closes_only_sessions_idle_past_the_timeout(clock):
+    transport = TrackedSseTransport("/messages/", idle_timeout=60.0, clock=clock)
+    quiet = open_session(transport, clock())
+    clock.advance(30)
+    busy = open_session(transport, clock())
+
+    clock.advance(30.1)
+    assert transport.reap() == 1
+
+    assert quiet.cancel_scope.cancel_called
+    assert not busy.cancel_scope.cancel_called
+
+
+async def test_posted_messages_keep_a_session_alive(clock):
+    transport = TrackedSseTransport("/messages/", idle_timeout=60.0, clock=clock)
+    info = open_session(transport, clock())
+    session_id = next(iter(transport.sessions))
+
+    clock.advance(50)
+    transport.touch(session_id, 120)
+    clock.advance(50)
+
+    assert transport.reap() == 0
+    assert (info.messages_in, info.bytes_in) == (1, 120)
+
+
+@pytest.fixture
+def app(mcp_server, stub_upstream, monkeypatch):
+    monkeypatch.setattr(haxumcp, "SSE_MAX_SESSIONS", 1)
+    monkeypatch.setattr(haxumcp, "SSE_IDLE_TIMEOUT", 0.2)
+    return create_starlette_app(mcp_server, streamable_http=False)
+
+
+async def test_sessions_past_the_limit_are_refused(app):
+    async with running(app), SseConnection(app) as first:
+        await first.endpoint()
+
+        async with SseConnection(app) as second:
+            await asyncio.wait_for(second._task, 5)
+
+        assert second.status == 503
+
+
+async def test_session_slot_is_freed_when_a_session_closes(app):
+    async with running(app):
+        async with SseConnection(app) as first:
+            await first.endpoint()
+
+        async with SseConnection(app) as second:
+            assert await second.endpoint()
+
+
+async def test_idle_session_is_closed_by_the_reaper(app):
+    async with running(app), SseConnection(app) as stream, client_for(app) as client:
+        endpoint = await stream.endpoint()
+        await initialize(client, endpoint)
+        await stream.next_message()
+
+        # Nothing posted for longer than SSE_IDLE_TIMEOUT: the reaper ends the response
+        await asyncio.wait_for(asyncio.shield(stream._task), 5)
+
+        response = await client.post(endpoint, json={"jsonrpc": "2.0", "id": 2, "method": "ping"})
+    assert response.status_code == 404
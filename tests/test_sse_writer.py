@@ -0,0 +1,131 @@
+"""Per-session SSE output buffering: coalescing writes, the buffer cap, and dropping clients that stop reading."""
+
+import asyncio
+import logging
+
+import pytest
+
+import haxumcp
+from haxumcp import create_starlette_app
+from sse_harness import SseConnection, client_for, initialize, running
+from sse_writer import CoalescingSend, SlowClientError
+
+pytestmark = pytest.mark.anyio
+
+START = {"type": "http.response.start", "status": 200, "headers": []}
+
+
+def chunk(body: bytes, more_body: bool = True) -> dict:
+    return {"type": "http.response.body", "body": body, "more_body": more_body}
+
+
+class RecordingSend:
+    """An ASGI send that records messages, and blocks every write while `stalled` is set."""
+
+    def __init__(self) -> None:
+        self.messages: list[dict] = []
+        self.stalled = False
+
+    async def __call__(self, message: dict) -> None:
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.messages.append(message)
+
+    @property
+    def bodies(self) -> list[bytes]:
+        return [message["body"] for message in self.messages if message["type"] == "http.response.body"]
+
+
+async def test_chunks_queued_within_the_flush_delay_are_written_once():
+    recorder = RecordingSend()
+    async with CoalescingSend(recorder, flush_delay=0.05) as send:
+        await send(START)
+        for part in (b"a", b"b", b"c"):
+            await send(chunk(part))
+        await send(chunk(b"d", more_body=False))
+
+    assert recorder.messages[0] == START
+    assert recorder.bodies == [b"abcd"]
+    assert recorder.messages[-1]["more_body"] is False
+    assert send.sent == 4
+    assert send.buffered == 0
+
+
+async def test_output_past_max_buffer_raises_slow_client_error():
+    recorder = RecordingSend()
+    recorder.stalled = True
+    async with CoalescingSend(recorder, max_buffer=10, flush_delay=0) as send:
+        await send(START)
+        await send(chunk(b"12345678"))
+
+        with pytest.raises(SlowClientError, match="more than 10 bytes"):
+            await send(chunk(b"345"))
+        # The session is done for: later writes fail too
+        with pytest.raises(SlowClientError):
+            await send(chunk(b"x"))
+
+
+async def test_write_slower_than_send_timeout_raises_slow_client_error():
+    recorder = RecordingSend()
+    recorder.stalled = True
+    async with CoalescingSend(recorder, flush_delay=0, send_timeout=0.01) as send:
+        await send(START)
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(SlowClientError, match="longer than 0.01s"):
+            await send(chunk(b"late"))
+
+
+async def test_heartbeat_is_written_while_the_stream_is_quiet():
+    recorder = RecordingSend()
+    async with CoalescingSend(recorder, flush_delay=0, heartbeat=0.01) as send:
+        await send(START)
+        await send(chunk(b"data"))
+        await asyncio.sleep(0.05)
+        await send(chunk(b"", more_body=False))
+
+    assert b": heartbeat\r\n\r\n" in recorder.bodies
+
+
+async def test_cancelling_the_caller_while_it_waits_for_the_writer_propagates():
+    recorder = RecordingSend()
+
+    async def respond():
+        async with CoalescingSend(recorder, flush_delay=0) as send:
+            await send(START)
+            recorder.stalled = True
+            await send(chunk(b"stuck", more_body=False))
+        # Leaving the block waits for the stuck write
+
+    task = asyncio.create_task(respond())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.wait([task], timeout=1)
+
+    assert task.cancelled()
+
+
+class StalledSseConnection(SseConnection):
+    """An SSE client that reads the endpoint event and then stops reading."""
+
+    stalled = False
+
+    async def _send(self, message):
+        if self.stalled:
+            await asyncio.Event().wait()
+        await super()._send(message)
+        self.stalled = b"event: endpoint" in message.get("body", b"")
+
+
+async def test_client_that_stops_reading_is_dropped(mcp_server, stub_upstream, monkeypatch, caplog):
+    monkeypatch.setattr(haxumcp, "SSE_SEND_TIMEOUT", 0.05)
+    app = create_starlette_app(mcp_server, streamable_http=False)
+    async with running(app), StalledSseConnection(app) as stream, client_for(app) as client:
+        endpoint = await stream.endpoint()
+        await initialize(client, endpoint)
+        await asyncio.sleep(0.1)
+        # The write after the timed-out one fails and ends the session
+        await client.post(endpoint, json={"jsonrpc": "2.0", "id": 2, "method": "ping"})
+        await asyncio.wait_for(asyncio.shield(stream._task), 5)
+
+    assert any("Dropping SSE session" in record.getMessage() for record in caplog.records)
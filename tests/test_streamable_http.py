@@ -0,0 +1,38 @@
+"""The stateless Streamable HTTP endpoint at /mcp."""
+
+import pytest
+
+from haxumcp import create_starlette_app
+from sse_harness import client_for, initialize_request, running
+
+pytestmark = pytest.mark.anyio
+
+HEADERS = {"Accept": "application/json, text/event-stream"}
+
+
+@pytest.fixture
+def app(mcp_server, stub_upstream):
+    return create_starlette_app(mcp_server, streamable_http=True)
+
+
+@pytest.mark.parametrize("path", ["/mcp", "/mcp/"])
+async def test_initialize_is_answered_at_either_path_without_a_redirect(app, path):
+    async with running(app), client_for(app) as client:
+        response = await client.post(path, json=initialize_request(), headers=HEADERS)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["result"]["serverInfo"]["name"] == "weather"
+
+
+async def test_tool_call_needs_no_session(app):
+    request = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "tools/call",
+        "params": {"name": "count_chinese_characters", "arguments": {"text": "天气 weather 预报"}},
+    }
+    async with running(app), client_for(app) as client:
+        response = await client.post("/mcp", json=request, headers=HEADERS)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["result"]["content"][0]["text"] == "Chinese character count: 4"
@@ -0,0 +1,77 @@
+"""Spans link a message POST to the tool call it triggers and to the upstream requests of that call."""
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+
+from haxumcp import create_starlette_app
+from sessions import LocalBroker
+from sse_harness import SseConnection, call_tool, client_for, running
+import tracing
+
+pytestmark = pytest.mark.anyio
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", tracing._tracer)  # noqa: SLF001
+    return tracing.in_memory_tracing()
+
+
+def only(spans, name, **attributes):
+    matches = [
+        span for span in spans
+        if span.name == name and all(span.attributes.get(key) == value for key, value in attributes.items())
+    ]
+    assert len(matches) == 1, [span.name for span in spans]
+    return matches[0]
+
+
+def is_parent(parent, child) -> bool:
+    return child.parent is not None and child.parent.span_id == parent.context.span_id
+
+
+def ancestors(span, spans):
+    by_id = {candidate.context.span_id: candidate for candidate in spans}
+    while span.parent is not None and span.parent.span_id in by_id:
+        span = by_id[span.parent.span_id]
+        yield span
+
+
+async def test_post_span_parents_tool_span_which_parents_upstream_get(mcp_server, stub_upstream, spans):
+    app = create_starlette_app(mcp_server, streamable_http=False)
+    async with running(app), SseConnection(app) as stream, client_for(app) as client:
+        reply = await call_tool(client, await stream.endpoint(), stream, "get_alerts", {"state": "CA"})
+    assert "result" in reply
+
+    finished = spans.get_finished_spans()
+    post = only(finished, "POST /messages/", **{"mcp.request_id": 2})
+    tool = only(finished, "tool get_alerts")
+    get = only(finished, "GET nws")
+    assert is_parent(post, tool)
+    assert tool in list(ancestors(get, finished))
+    assert get.context.trace_id == post.context.trace_id
+
+
+async def test_trace_context_follows_a_forwarded_message(mcp_server, stub_upstream, spans):
+    broker = LocalBroker()
+    owner, other = (create_starlette_app(mcp_server, broker=broker, streamable_http=False) for _ in range(2))
+    traceparent = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+    async with running(owner), running(other), SseConnection(owner) as stream, client_for(other) as client:
+        reply = await call_tool(
+            client, await stream.endpoint(), stream, "get_alerts", {"state": "CA"}, headers={"traceparent": traceparent}
+        )
+    assert "result" in reply
+
+    finished = spans.get_finished_spans()
+    post = only(finished, "POST /messages/", **{"mcp.request_id": 2})
+    delivery = only(finished, "forwarded message", **{"mcp.request_id": 2})
+    tool = only(finished, "tool get_alerts")
+    get = only(finished, "GET nws")
+    assert post.attributes["mcp.forwarded_to"]
+    assert format(post.context.trace_id, "032x") == TRACE_ID
+    assert is_parent(post, delivery)
+    assert is_parent(delivery, tool)
+    assert tool in list(ancestors(get, finished))
@@ -0,0 +1,260 @@
+"""Upstream call policies: retries, the circuit breaker, rate and concurrency limits, and serving cached data."""
+
+import asyncio
+
+import httpx
+import pytest
+
+import haxumcp
+from upstream import (
+    CircuitBreaker,
+    CircuitOpenError,
+    TokenBucket,
+    UpstreamConfig,
+    UpstreamLimiter,
+    UpstreamPool,
+    UpstreamThrottledError,
+)
+
+pytestmark = pytest.mark.anyio
+
+URL = "https://upstream.test/resource"
+
+
+class Responses:
+    """Mock transport handler answering with queued responses, then 200s, and counting requests."""
+
+    def __init__(self, *responses: httpx.Response) -> None:
+        self.queue = list(responses)
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.queue.pop(0) if self.queue else httpx.Response(200, json={"ok": True})
+
+
+def make_pool(handler, clock, **settings):
+    sleeps = []
+
+    async def sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    settings = {"retries": 2, "backoff_base": 0.0, "breaker_threshold": 3, "breaker_reset": 30.0, **settings}
+    config = UpstreamConfig("test", timeout=1.0, **settings)
+    pool = UpstreamPool([config], transport=httpx.MockTransport(handler), clock=clock, sleep=sleep)
+    return pool, sleeps
+
+
+def test_breaker_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", threshold=3, reset_timeout=30.0, clock=clock)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.is_open
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", threshold=3, reset_timeout=30.0, clock=clock)
+
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+
+    assert not breaker.is_open
+
+
+def test_half_open_breaker_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker("test", threshold=1, reset_timeout=30.0, clock=clock)
+    breaker.record_failure()
+
+    clock.advance(29.9)
+    assert not breaker.allow()
+    clock.advance(0.1)
+    assert breaker.allow()
+    # Everyone else keeps failing fast while the probe is out
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+def test_failed_probe_keeps_breaker_open_for_another_reset_timeout(clock):
+    breaker = CircuitBreaker("test", threshold=1, reset_timeout=30.0, clock=clock)
+    breaker.record_failure()
+    clock.advance(30.0)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    clock.advance(29.9)
+    assert not breaker.allow()
+    clock.advance(0.1)
+    assert breaker.allow()
+
+
+def test_released_probe_goes_to_the_next_call(clock):
+    breaker = CircuitBreaker("test", threshold=1, reset_timeout=30.0, clock=clock)
+    breaker.record_failure()
+    clock.advance(30.0)
+    assert breaker.allow()
+
+    breaker.release()
+
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+async def test_retries_503_after_its_retry_after_delay(clock):
+    handler = Responses(httpx.Response(503, headers={"Retry-After": "1.5"}))
+    pool, sleeps = make_pool(handler, clock)
+
+    response = await pool.get("test", URL)
+
+    assert response.status_code == 200
+    assert len(handler.requests) == 2
+    assert sleeps == [1.5]
+
+
+async def test_retry_after_is_capped_at_backoff_max(clock):
+    handler = Responses(httpx.Response(429, headers={"Retry-After": "3600"}))
+    pool, sleeps = make_pool(handler, clock, backoff_max=2.0)
+
+    assert (await pool.get("test", URL)).status_code == 200
+    assert sleeps == [2.0]
+
+
+async def test_last_retryable_response_is_returned_once_retries_run_out(clock):
+    handler = Responses(*[httpx.Response(503) for _ in range(3)])
+    pool, sleeps = make_pool(handler, clock)
+
+    response = await pool.get("test", URL)
+
+    assert response.status_code == 503
+    assert len(handler.requests) == 3
+    assert len(sleeps) == 2
+
+
+async def test_client_errors_are_not_retried(clock):
+    handler = Responses(httpx.Response(404))
+    pool, _ = make_pool(handler, clock)
+
+    assert (await pool.get("test", URL)).status_code == 404
+    assert len(handler.requests) == 1
+    assert not pool.breakers["test"].is_open
+
+
+async def test_open_breaker_fails_without_a_request(clock):
+    handler = Responses(*[httpx.Response(503) for _ in range(3)])
+    pool, _ = make_pool(handler, clock)
+    await pool.get("test", URL)
+
+    with pytest.raises(CircuitOpenError):
+        await pool.get("test", URL)
+    assert len(handler.requests) == 3
+
+    clock.advance(30.0)
+    assert (await pool.get("test", URL)).status_code == 200
+    assert not pool.breakers["test"].is_open
+
+
+async def test_throttled_probe_is_handed_back(clock):
+    pool, _ = make_pool(Responses(), clock, breaker_threshold=1, max_concurrency=1, queue_timeout=0.01)
+    breaker = pool.breakers["test"]
+    breaker.record_failure()
+    clock.advance(30.0)
+    # Another request holds the only concurrency slot
+    async with pool.limiters["test"].slot():
+        with pytest.raises(UpstreamThrottledError):
+            await pool.get("test", URL)
+
+    assert breaker.allow()
+
+
+async def test_fetch_nws_serves_cached_body_while_breaker_is_open(stub_upstream, monkeypatch, clock):
+    url = f"{haxumcp.NWS_API_BASE}/alerts/active/area/CA"
+    cached = {"features": [{"id": "cached"}]}
+    headers = httpx.Headers({"Cache-Control": "max-age=0, must-revalidate", "ETag": '"v1"'})
+    haxumcp.nws_cache.store(url, cached, headers)
+    breaker = CircuitBreaker("nws", threshold=1, reset_timeout=30.0, clock=clock)
+    breaker.record_failure()
+    monkeypatch.setitem(haxumcp.upstreams.breakers, "nws", breaker)
+
+    assert await haxumcp.make_nws_request(url) == cached
+    assert not stub_upstream.requests
+
+
+# Token buckets refill at 100 tokens/s, so a turn in the queue is 10ms of real sleep; the fake clock stays put
+
+
+async def test_bucket_rejects_a_caller_whose_turn_is_after_its_deadline(clock):
+    bucket = TokenBucket(rate=100.0, burst=1, clock=clock)
+    await bucket.acquire(deadline=clock() + 1)
+
+    with pytest.raises(TimeoutError):
+        await bucket.acquire(deadline=clock() + 0.005)
+    # The rejected caller took no token, so the next one is still first in line
+    await asyncio.wait_for(bucket.acquire(deadline=clock() + 0.01), 1)
+
+
+async def test_bucket_serves_waiters_in_arrival_order(clock):
+    bucket = TokenBucket(rate=100.0, burst=1, clock=clock)
+    await bucket.acquire(deadline=clock() + 1)
+    done = []
+
+    async def acquire(name: str, within: float) -> None:
+        await bucket.acquire(deadline=clock() + within)
+        done.append(name)
+
+    second = asyncio.create_task(acquire("second", 1))
+    await asyncio.sleep(0)
+    # Second is owed the next token, so a third caller's turn is 20ms away
+    with pytest.raises(TimeoutError):
+        await acquire("third", 0.015)
+    await asyncio.wait_for(asyncio.gather(second, acquire("fourth", 0.025)), 1)
+
+    assert done == ["second", "fourth"]
+
+
+async def test_cancelled_waiter_gives_its_token_back(clock):
+    bucket = TokenBucket(rate=100.0, burst=1, clock=clock)
+    await bucket.acquire(deadline=clock() + 1)
+    waiter = asyncio.create_task(bucket.acquire(deadline=clock() + 1))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    # Without the refund this caller's turn would be 20ms away
+    await asyncio.wait_for(bucket.acquire(deadline=clock() + 0.015), 1)
+
+
+async def test_rate_limited_slot_past_the_queue_timeout_is_throttled(clock):
+    limiter = UpstreamLimiter(UpstreamConfig("test", timeout=1.0, rate_limit=1.0, burst=1, queue_timeout=0.5), clock)
+    async with limiter.slot():
+        pass
+
+    with pytest.raises(UpstreamThrottledError):
+        async with limiter.slot():
+            pass
+    assert limiter.waiting == 0
+
+
+async def test_concurrency_slot_wait_past_the_queue_timeout_is_throttled():
+    limiter = UpstreamLimiter(UpstreamConfig("test", timeout=1.0, max_concurrency=1, queue_timeout=0.01))
+    async with limiter.slot():
+        with pytest.raises(UpstreamThrottledError):
+            async with limiter.slot():
+                pass
+        assert limiter.waiting == 0
+
+    # The slot was released, and the timed-out waiter did not keep one
+    async with limiter.slot():
+        pass
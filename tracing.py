@@ -0,0 +1,137 @@
+"""OpenTelemetry tracing, from the `/messages/` POST through tool dispatch to upstream HTTP calls.
+
+Tracing is optional: without the `opentelemetry-api` package every helper
+here is a no-op. Exporting spans needs `opentelemetry-sdk` as well; see
+`configure_tracing` and, for tests, `in_memory_tracing`.
+
+A client message and the tool call it triggers run in different tasks (the
+POST handler hands the message to the session over a stream), so the POST
+span's context is parked under (session id, JSON-RPC id) and picked up as the
+parent of the tool span. Messages forwarded to another worker carry the
+context along as W3C trace headers (see `inject` and `extract`).
+"""
+
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import logging
+import os
+from typing import Any, Iterator
+
+try:
+    from opentelemetry import propagate, trace
+except ImportError:  # tracing disabled
+    propagate = trace = None
+
+logger = logging.getLogger(__name__)
+
+# Hex id of the SSE session the current task serves, set for the lifetime of the session
+session_id_var: ContextVar[str | None] = ContextVar("mcp_session_id", default=None)
+
+# (session id, JSON-RPC id) -> span context of the POST that delivered the request
+_pending: dict[tuple[str, Any], Any] = {}
+_MAX_PENDING = 10_000
+
+_tracer = trace.get_tracer(__name__) if trace is not None else None
+
+
+def set_tracer_provider(provider) -> None:
+    """Trace through `provider` rather than the global one (which can only be set once per process)."""
+    global _tracer
+    _tracer = provider.get_tracer(__name__)
+
+
+def span(name: str, context=None, **attributes: Any):
+    """Start a span as the current span, or do nothing if tracing is unavailable.
+
+    None-valued attributes are left out.
+    """
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(
+        name, context=context, attributes={key: value for key, value in attributes.items() if value is not None}
+    )
+
+
+def inject() -> dict[str, str]:
+    """The current trace context as W3C headers (`traceparent`, ...), to send along to another process."""
+    carrier: dict[str, str] = {}
+    if propagate is not None:
+        propagate.inject(carrier)
+    return carrier
+
+
+def extract(carrier) -> Any:
+    """A parent context for `span` from trace headers (a dict from `inject`, or request headers)."""
+    if propagate is None or not carrier:
+        return None
+    return propagate.extract(carrier)
+
+
+def remember_message(session_id: str, request_id: Any) -> None:
+    """Record the current span as the origin of a JSON-RPC request on a session."""
+    if trace is None or request_id is None:
+        return
+    if len(_pending) >= _MAX_PENDING:
+        # Requests that never reached a tool (e.g. not tool calls) are not cleaned up otherwise
+        _pending.clear()
+    _pending[(session_id, request_id)] = trace.get_current_span().get_span_context()
+
+
+@contextmanager
+def tool_span(name: str, request_id: Any) -> Iterator[Any]:
+    """Span for a tool call, parented to the POST that delivered it when that is known."""
+    context = None
+    origin = _pending.pop((session_id_var.get(), request_id), None)
+    if origin is not None and origin.is_valid:
+        context = trace.set_span_in_context(trace.NonRecordingSpan(origin))
+    with span(f"tool {name}", context=context, **{"mcp.tool": name, "mcp.request_id": str(request_id)}) as current:
+        yield current
+
+
+def set_attributes(current, **attributes: Any) -> None:
+    """Set attributes on a span returned by `span`, tolerating the no-op case."""
+    if current is not None:
+        current.set_attributes({key: value for key, value in attributes.items() if value is not None})
+
+
+def configure_tracing() -> None:
+    """Export spans as configured by TRACING_EXPORTER (`otlp` or `console`), if set.
+
+    `otlp` uses the standard OTEL_EXPORTER_OTLP_* variables and needs the
+    `opentelemetry-exporter-otlp` package.
+    """
+    exporter_name = os.environ.get("TRACING_EXPORTER", "").lower()
+    if not exporter_name:
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if exporter_name == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+            exporter = OTLPSpanExporter()
+        else:
+            exporter = ConsoleSpanExporter()
+    except ImportError:
+        logger.warning("TRACING_EXPORTER=%s needs the OpenTelemetry SDK and exporter packages; tracing is off",
+                       exporter_name)
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": os.environ.get("OTEL_SERVICE_NAME", "haxumcp")}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    set_tracer_provider(provider)
+
+
+def in_memory_tracing():
+    """Route spans to an in-memory exporter and return it; call `get_finished_spans()` to inspect them."""
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    set_tracer_provider(provider)
+    return exporter
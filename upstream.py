@@ -0,0 +1,684 @@
+"""Shared plumbing for the upstream HTTP APIs used by the MCP tools."""
+
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+import httpx
+
+from config import env_bool, env_float, env_int
+from disk_cache import DiskCache, DiskEntry
+from metrics import REGISTRY
+import tracing
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_REQUEST_SECONDS = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "Duration of each upstream HTTP attempt, by upstream, host and response status",
+    ("upstream", "host", "status"),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by cache and result (fresh, stale, expired or miss)", ("cache", "result")
+)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Connection settings for one upstream API."""
+
+    name: str
+    timeout: float
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    # Retries of failed GETs, with full-jitter exponential backoff between attempts
+    retries: int = 2
+    backoff_base: float = 0.2
+    backoff_max: float = 2.0
+    # Consecutive failures that open the circuit breaker, and how long it stays open
+    breaker_threshold: int = 5
+    breaker_reset: float = 30.0
+    # Requests per second (0 = unlimited) with bursts of up to `burst`, at most
+    # `max_concurrency` in flight (0 = unlimited), and how long callers may queue
+    rate_limit: float = 0.0
+    burst: int = 10
+    max_concurrency: int = 16
+    queue_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls, name: str, timeout: float) -> "UpstreamConfig":
+        """Build a config, letting HTTP_* and <NAME>_* environment variables override the defaults."""
+        prefix = name.upper()
+
+        def pick(key: str, default, parse):
+            return parse(f"{prefix}_{key}", parse(f"HTTP_{key}", default))
+
+        return cls(
+            name=name,
+            timeout=env_float(f"{prefix}_TIMEOUT", timeout),
+            connect_timeout=pick("CONNECT_TIMEOUT", cls.connect_timeout, env_float),
+            max_connections=pick("MAX_CONNECTIONS", cls.max_connections, env_int),
+            max_keepalive_connections=pick("MAX_KEEPALIVE", cls.max_keepalive_connections, env_int),
+            keepalive_expiry=pick("KEEPALIVE_EXPIRY", cls.keepalive_expiry, env_float),
+            http2=pick("HTTP2", cls.http2, env_bool),
+            retries=pick("RETRIES", cls.retries, env_int),
+            backoff_base=pick("BACKOFF_BASE", cls.backoff_base, env_float),
+            backoff_max=pick("BACKOFF_MAX", cls.backoff_max, env_float),
+            breaker_threshold=pick("BREAKER_THRESHOLD", cls.breaker_threshold, env_int),
+            breaker_reset=pick("BREAKER_RESET", cls.breaker_reset, env_float),
+            rate_limit=pick("RATE_LIMIT", cls.rate_limit, env_float),
+            burst=pick("BURST", cls.burst, env_int),
+            max_concurrency=pick("MAX_CONCURRENCY", cls.max_concurrency, env_int),
+            queue_timeout=pick("QUEUE_TIMEOUT", cls.queue_timeout, env_float),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based), with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+
+class UpstreamThrottledError(Exception):
+    """Raised when a request could not get a rate or concurrency slot before its deadline."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(f"Timed out waiting for a request slot for upstream '{name}'")
+        self.name = name
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter.
+
+    Callers reserve a token up front, even if that leaves the bucket in
+    debt, and then sleep until it is theirs. Waiters are therefore served in
+    arrival order, and a caller whose turn would come after its deadline is
+    turned away without taking a token. A caller cancelled while waiting
+    gives its token back.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    async def acquire(self, deadline: float) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+        if now + wait > deadline:
+            raise TimeoutError
+        self._tokens -= 1
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._tokens += 1
+                raise
+
+
+class UpstreamLimiter:
+    """Rate and concurrency limits for one upstream, shared by every session."""
+
+    def __init__(self, config: "UpstreamConfig", clock: Callable[[], float] = time.monotonic) -> None:
+        self.name = config.name
+        self.queue_timeout = config.queue_timeout
+        self._clock = clock
+        self._bucket = TokenBucket(config.rate_limit, config.burst, clock) if config.rate_limit > 0 else None
+        self._semaphore = asyncio.Semaphore(config.max_concurrency) if config.max_concurrency > 0 else None
+        # Callers currently queued for a rate or concurrency slot
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait (at most `queue_timeout`) for permission to send one request."""
+        deadline = self._clock() + self.queue_timeout
+        self.waiting += 1
+        try:
+            if self._bucket is not None:
+                await self._bucket.acquire(deadline)
+            if self._semaphore is not None:
+                await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - self._clock()))
+        except TimeoutError:
+            raise UpstreamThrottledError(self.name) from None
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(f"Circuit breaker for upstream '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures.
+
+    After `threshold` consecutive failures the breaker opens and calls fail
+    immediately. Once `reset_timeout` has passed, one call is let through as
+    a probe: success closes the breaker, failure keeps it open for another
+    `reset_timeout`. A probe that ends without an outcome (throttled or
+    cancelled before a response) is handed back with `release()`.
+    """
+
+    def __init__(
+        self, name: str, threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        # When the breaker had opened before the outstanding probe, if one is outstanding
+        self._probe_from: float | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        now = self._clock()
+        if now - self._opened_at < self.reset_timeout:
+            return False
+        # Let this call probe the upstream; others keep failing fast until it reports back
+        self._probe_from, self._opened_at = self._opened_at, now
+        return True
+
+    def release(self) -> None:
+        """Hand back a probe granted by `allow()` that produced no outcome, so the next call may probe."""
+        if self._probe_from is not None:
+            self._opened_at, self._probe_from = self._probe_from, None
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe_from = None
+
+    def record_failure(self) -> None:
+        self._probe_from = None
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.threshold:
+            if self._opened_at is None:
+                logger.warning("Opening circuit breaker for %s after %d consecutive failures", self.name, self._failures)
+            self._opened_at = self._clock()
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire after `ttl` seconds.
+
+    When full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def parse_cache_control(value: str) -> dict[str, str | None]:
+    """Split a Cache-Control header into a {directive: argument} mapping."""
+    directives: dict[str, str | None] = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+def _seconds(value: str | None) -> float | None:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def freshness(
+    headers: httpx.Headers, default_swr: float = 0.0, default_ttl: float = 0.0
+) -> tuple[float, float] | None:
+    """Return (fresh lifetime, stale-while-revalidate window) in seconds for a response.
+
+    Follows RFC 9111 for a shared cache: s-maxage wins over max-age, which
+    wins over Expires. A response without any of them gets `default_ttl`;
+    if that is 0 it gets no lifetime, so it is only worth keeping for
+    conditional revalidation. `no-cache` responses get neither a lifetime nor
+    a stale window. Returns None when the response must not be stored.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+    if "no-store" in directives or "private" in directives:
+        return None
+
+    lifetime = _seconds(directives.get("s-maxage")) if "s-maxage" in directives else None
+    if lifetime is None and "max-age" in directives:
+        lifetime = _seconds(directives["max-age"])
+    if lifetime is None and "expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["expires"])
+            date = parsedate_to_datetime(headers["date"]) if "date" in headers else None
+            now = date.timestamp() if date else time.time()
+            lifetime = max(0.0, expires.timestamp() - now)
+        except (TypeError, ValueError):
+            lifetime = 0.0
+    if lifetime is None:
+        if not default_ttl:
+            return 0.0, 0.0
+        lifetime = default_ttl
+    lifetime = max(0.0, lifetime - (_seconds(headers.get("Age")) or 0.0))
+
+    swr = _seconds(directives.get("stale-while-revalidate"))
+    if swr is None:
+        swr = default_swr
+    if "no-cache" in directives:
+        # Never served without revalidating first, not even while stale
+        lifetime, swr = 0.0, 0.0
+    if "must-revalidate" in directives or "proxy-revalidate" in directives:
+        swr = 0.0
+    return lifetime, swr
+
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+
+@dataclass
+class CachedResponse:
+    """A stored upstream response body, how long it may be served and its validators."""
+
+    body: Any
+    fresh_until: float
+    stale_until: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Request headers that ask the upstream to answer 304 if the body is unchanged."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """In-process cache of upstream responses that honours Cache-Control and Expires.
+
+    Fresh entries are served directly. Entries inside their
+    stale-while-revalidate window are served immediately while a single
+    background task refreshes them. Past that window, entries that carry an
+    ETag or Last-Modified validator are kept (until evicted) so the next
+    request can revalidate them conditionally instead of re-downloading.
+
+    With a `backend`, entries are also written through to a DiskCache under
+    `name`, and `load()` falls back to it on an in-memory miss, so workers on
+    the same host share responses.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        default_swr: float = 0.0,
+        default_ttl: float = 0.0,
+        name: str = "",
+        backend: DiskCache | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.default_swr = default_swr
+        self.default_ttl = default_ttl
+        self.name = name
+        self.backend = backend
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+
+    def lookup(self, key: Hashable) -> tuple[CachedResponse | None, str | None]:
+        """Return the entry for `key` and whether it is FRESH, STALE or EXPIRED."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        now = self._clock()
+        if entry.fresh_until > now:
+            status = FRESH
+        elif entry.stale_until > now:
+            status = STALE
+        elif entry.etag or entry.last_modified:
+            status = EXPIRED
+        else:
+            del self._entries[key]
+            return None, None
+        self._entries.move_to_end(key)
+        return entry, status
+
+    async def load(self, key: Hashable) -> tuple[CachedResponse | None, str | None]:
+        """Like `lookup()`, but fall back to the shared disk cache on a miss."""
+        entry, status = self.lookup(key)
+        if entry is None and self.backend is not None:
+            entry, status = await self._load_from_backend(key)
+        CACHE_REQUESTS.inc(self.name, status or "miss")
+        return entry, status
+
+    async def _load_from_backend(self, key: Hashable) -> tuple[CachedResponse | None, str | None]:
+        stored = await self.backend.get(self.name, str(key))
+        if stored is None:
+            return None, None
+        # Disk entries use wall-clock time; convert to this cache's clock
+        offset = self._clock() - time.time()
+        self._insert(key, CachedResponse(
+            body=stored.body,
+            fresh_until=stored.fresh_until + offset,
+            stale_until=stored.stale_until + offset,
+            etag=stored.etag,
+            last_modified=stored.last_modified,
+        ))
+        return self.lookup(key)
+
+    def peek(self, key: Hashable) -> CachedResponse | None:
+        """Return the stored entry for `key` regardless of its age."""
+        return self._entries.get(key)
+
+    def store(self, key: Hashable, body: Any, headers: httpx.Headers) -> CachedResponse | None:
+        """Store a response body if its headers allow caching it."""
+        lifetime = freshness(headers, self.default_swr, self.default_ttl)
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if lifetime is None or (lifetime == (0.0, 0.0) and not (etag or last_modified)):
+            self._entries.pop(key, None)
+            return None
+        fresh_for, swr = lifetime
+        now = self._clock()
+        entry = CachedResponse(
+            body=body,
+            fresh_until=now + fresh_for,
+            stale_until=now + fresh_for + swr,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        self._insert(key, entry)
+        if self.backend is not None:
+            offset = time.time() - now
+            self.backend.put(self.name, str(key), DiskEntry(
+                entry.body, entry.fresh_until + offset, entry.stale_until + offset, etag, last_modified
+            ))
+        return entry
+
+    def _insert(self, key: Hashable, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def refresh(self, key: Hashable, headers: httpx.Headers) -> CachedResponse | None:
+        """Renew a stored entry from the headers of a 304 Not Modified, keeping its body.
+
+        Returns the previous entry if the 304 makes the body uncacheable, or
+        None if the entry was evicted in the meantime.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        # A 304 carries the current caching headers; validators it omits stay valid
+        merged = httpx.Headers(headers)
+        if entry.etag and "ETag" not in merged:
+            merged["ETag"] = entry.etag
+        if entry.last_modified and "Last-Modified" not in merged:
+            merged["Last-Modified"] = entry.last_modified
+        return self.store(key, entry.body, merged) or entry
+
+    def revalidate(self, key: Hashable, refresh: Callable[[], Awaitable[Any]]) -> None:
+        """Run `refresh` in the background unless a refresh of `key` is already running."""
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def canonical_url(url: str | httpx.URL) -> str:
+    """Normalise a URL so equivalent requests share one key (host case, default port, query order)."""
+    url = httpx.URL(url).copy_with(fragment=None)
+    if url.params:
+        url = url.copy_with(params=sorted(url.params.multi_items()))
+    return str(url)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight call.
+
+    The first caller starts the work as a task; callers that arrive while it
+    is running await the same task. A caller being cancelled does not cancel
+    the shared work for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Responses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def upstream_unavailable(error: Exception) -> bool:
+    """Whether an error means the upstream is down or overloaded, rather than rejecting the request."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, (CircuitOpenError, UpstreamThrottledError, httpx.TransportError))
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class UpstreamPool:
+    """One long-lived, connection-pooled httpx.AsyncClient per upstream.
+
+    Clients are created lazily, so tools still work when the pool was never
+    started (e.g. when the server runs over stdio), and are closed together by
+    `aclose()` when the Starlette app shuts down. `get()` adds each upstream's
+    rate/concurrency limits, retry policy and circuit breaker on top of its
+    client.
+    """
+
+    def __init__(
+        self,
+        configs: list[UpstreamConfig],
+        transport: httpx.AsyncBaseTransport | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ) -> None:
+        self._configs = {config.name: config for config in configs}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self.breakers = {
+            config.name: CircuitBreaker(config.name, config.breaker_threshold, config.breaker_reset, clock)
+            for config in configs
+        }
+        self.limiters = {config.name: UpstreamLimiter(config, clock) for config in configs}
+        # Lets benchmarks and tests route every upstream to a stub transport, and skip backoff delays.
+        self._transport = transport
+        self._sleep = sleep
+
+    def config(self, name: str) -> UpstreamConfig:
+        return self._configs[name]
+
+    async def get(self, name: str, url: str, **kwargs: Any) -> httpx.Response:
+        """GET `url` from an upstream, retrying transient failures.
+
+        Connection errors, timeouts and retryable statuses are retried up to
+        the configured number of times. Raises CircuitOpenError without
+        making a request while the upstream's breaker is open, and
+        UpstreamThrottledError if no request slot frees up in time. The last
+        response (or error) is returned (or raised) once retries run out.
+        """
+        config = self._configs[name]
+        breaker = self.breakers[name]
+        limiter = self.limiters[name]
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(name)
+            retry_after = None
+            try:
+                async with limiter.slot():
+                    host = httpx.URL(url).host
+                    started = time.perf_counter()
+                    status = "error"
+                    with tracing.span(
+                        f"GET {name}",
+                        **{
+                            "http.request.method": "GET",
+                            "url.full": url,
+                            "server.address": host,
+                            "upstream": name,
+                            "http.request.resend_count": attempt or None,
+                        },
+                    ) as span:
+                        try:
+                            response = await self.client(name).get(url, **kwargs)
+                            status = response.status_code
+                        finally:
+                            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - started, name, host, status)
+                            tracing.set_attributes(span, **{"http.response.status_code": status})
+            except httpx.TransportError:
+                breaker.record_failure()
+                if attempt >= config.retries:
+                    raise
+            except BaseException:
+                # Throttled or cancelled: nothing to report, so a probe this call was granted goes back
+                breaker.release()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if attempt >= config.retries:
+                    return response
+                retry_after = _retry_after(response)
+            delay = config.backoff(attempt)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, config.backoff_max))
+            await self._sleep(delay)
+            attempt += 1
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        """Return the shared client for an upstream, creating it on first use."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build_client(self._configs[name])
+        return client
+
+    def _build_client(self, config: UpstreamConfig) -> httpx.AsyncClient:
+        http2 = config.http2
+        if http2 and not _http2_available():
+            logger.warning("HTTP/2 requested for %s but the 'h2' package is not installed; using HTTP/1.1", config.name)
+            http2 = False
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            http2=http2,
+            transport=self._transport,
+        )
+
+    async def start(self) -> None:
+        """Open every configured client up front."""
+        for name in self._configs:
+            self.client(name)
+
+    async def aclose(self) -> None:
+        """Close all clients and release their pooled connections."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()